@@ -0,0 +1,229 @@
+# benchmarks/bench_render.py
+"""Headless per-stage render benchmark over backgrounds/ and resource/.
+
+Usage:
+    python -m benchmarks.bench_render [--samples 20] [--repeat 3] [--output results.json]
+                                      [--baseline baseline.json] [--threshold 0.15]
+                                      [--save-baseline baseline.json]
+
+Setiap stage diukur terpisah (decode, watermark paste, layout, draw, compose
+dengan base layer ter-cache, thumbnail, encode). decode selalu decode file asli;
+background yang ada di pixel store (background_store) diukur terpisah sebagai store_open. Dengan --baseline, p50 yang lebih lambat dari threshold dianggap
+regresi dan exit code menjadi 1.
+"""
+from pathlib import Path
+from typing import Callable, Optional
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from image_processor.background_store import mapped_background
+from image_processor.encoder import EncoderSettings, encode
+from image_processor.layout import clear_caches
+from image_processor.renderer import (
+    FONT_SIZE,
+    PREVIEW_SIZE,
+    compose_quote,
+    decode_background,
+    layout_quote,
+    load_font,
+    load_watermark,
+    open_background,
+    split_text_into_lines,
+)
+
+SEED = 20240131
+WORDS = (
+    "hidup adalah perjalanan panjang yang penuh dengan pelajaran berharga bagi siapa saja "
+    "yang mau belajar dari setiap langkah kecil menuju mimpi besar bersama desa merdeka"
+).split()
+ENCODERS = {
+    "encode_png": EncoderSettings(format="PNG"),
+    "encode_jpeg": EncoderSettings(format="JPEG", quality=90),
+    "encode_webp": EncoderSettings(format="WEBP", quality=85),
+}
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, if the platform exposes it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux melaporkan KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50) * 1000,
+        "p90_ms": pick(0.90) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def make_quotes(count: int) -> list[str]:
+    rng = random.Random(SEED)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))) for _ in range(count)]
+
+
+def pick_backgrounds(directory: Path, count: int) -> list[Path]:
+    """Deterministic sample of decodable backgrounds"""
+    candidates = sorted(p for p in directory.iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    valid = []
+    for path in candidates:
+        try:
+            with Image.open(path) as image:
+                image.verify()
+            valid.append(path)
+        except Exception:
+            continue
+    rng = random.Random(SEED)
+    rng.shuffle(valid)
+    return sorted(valid[:count])
+
+
+def run(backgrounds: list[Path], repeat: int) -> dict:
+    timings: dict[str, list[float]] = {}
+
+    def timed(stage: str, fn: Callable):
+        start = time.perf_counter()
+        value = fn()
+        timings.setdefault(stage, []).append(time.perf_counter() - start)
+        return value
+
+    quotes = make_quotes(len(backgrounds) * repeat)
+    watermark = load_watermark()
+    font = load_font(FONT_SIZE)
+
+    # Warm-up: import lazy codec dan face FreeType tidak ikut terukur
+    warm = decode_background(backgrounds[0])
+    ImageDraw.Draw(warm).text((0, 0), "warm", font=font)
+
+    for round_index in range(repeat):
+        for i, path in enumerate(backgrounds):
+            quote = quotes[round_index * len(backgrounds) + i]
+
+            # Decode eksplisit: angka decode tidak berubah hanya karena ada .pixel_store
+            base = timed("decode", lambda: decode_background(path))
+            timed("decode_proxy", lambda: decode_background(path, PREVIEW_SIZE))
+            if mapped_background(path) is not None:
+                timed("store_open", lambda: open_background(path))
+
+            canvas = base.copy()
+            timed("watermark_paste", lambda: canvas.paste(watermark, watermark))
+
+            timed("layout_split_chars", lambda: split_text_into_lines(quote))
+            clear_caches()
+            layout = timed("layout_pixel_cold", lambda: layout_quote(quote))
+            timed("layout_pixel_warm", lambda: layout_quote(quote))
+
+            def draw_text():
+                draw = ImageDraw.Draw(canvas)
+                draw_font = load_font(layout.font_size)
+                y = layout.y
+                for line in layout.lines:
+                    draw.text((layout.x, y), line, font=draw_font, fill="#FFFFFF")
+                    y += layout.line_height
+
+            timed("text_draw", draw_text)
+
+            # Base dan mask teks sudah di-cache: yang terukur hanya copy base + fill teks (ganti warna)
+            compose_quote(base, quote, watermark=watermark, layout=layout)
+            timed("compose_layered", lambda: compose_quote(base, quote, "#FFEE00", watermark=watermark))
+
+            thumb = canvas.copy()
+            timed("thumbnail", lambda: thumb.thumbnail(PREVIEW_SIZE))
+
+            for stage, settings in ENCODERS.items():
+                timed(stage, lambda: encode(canvas, settings))
+
+    return {stage: percentiles(samples) for stage, samples in timings.items()}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Stages whose p50 got slower than baseline by more than threshold"""
+    regressions = []
+    for stage, stats in results["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old or old["p50_ms"] <= 0:
+            continue
+        change = stats["p50_ms"] / old["p50_ms"] - 1
+        if change > threshold:
+            regressions.append(
+                f"{stage}: p50 {old['p50_ms']:.2f} ms -> {stats['p50_ms']:.2f} ms (+{change * 100:.0f}%)"
+            )
+    old_rss, new_rss = baseline.get("peak_rss_bytes"), results.get("peak_rss_bytes")
+    if old_rss and new_rss and new_rss / old_rss - 1 > threshold:
+        regressions.append(f"peak_rss: {old_rss / 2**20:.0f} MiB -> {new_rss / 2**20:.0f} MiB")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-stage render benchmark")
+    parser.add_argument("--backgrounds", default="backgrounds")
+    parser.add_argument("--samples", type=int, default=20, help="number of backgrounds")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="also write results as a new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed p50 slowdown (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    backgrounds = pick_backgrounds(Path(args.backgrounds), args.samples)
+    if not backgrounds:
+        print(f"No decodable backgrounds in {args.backgrounds}", file=sys.stderr)
+        return 2
+
+    results = {
+        "python": platform.python_version(),
+        "pillow": Image.__version__,
+        "machine": platform.machine(),
+        "backgrounds": [p.name for p in backgrounds],
+        "repeat": args.repeat,
+        "pixel_store": any(mapped_background(path) is not None for path in backgrounds),
+        "stages": run(backgrounds, args.repeat),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+    print(f"{'stage':<22}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for stage, stats in results["stages"].items():
+        print(f"{stage:<22}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    if results["peak_rss_bytes"]:
+        print(f"peak RSS: {results['peak_rss_bytes'] / 2**20:.1f} MiB")
+
+    for target in (args.output, args.save_baseline):
+        if target:
+            with open(target, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nPERFORMANCE REGRESSION (threshold {args.threshold * 100:.0f}%):", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"\nNo regressions against {args.baseline} (threshold {args.threshold * 100:.0f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,24 @@
 # config/__init__.py
-# File ini sengaja dikosongkan.
\ No newline at end of file
+from .settings import (
+    AppConfig,
+    ConfigError,
+    ConfigWatcher,
+    EncoderDefaults,
+    MetricsSettings,
+    PerformanceSettings,
+    load_config,
+    parse_config,
+    write_default_config,
+)
+
+__all__ = [
+    "AppConfig",
+    "ConfigError",
+    "ConfigWatcher",
+    "EncoderDefaults",
+    "MetricsSettings",
+    "PerformanceSettings",
+    "load_config",
+    "parse_config",
+    "write_default_config",
+]
@@ -0,0 +1,291 @@
+# config/settings.py
+"""Typed application settings parsed from config.json, with mtime-based hot reload."""
+from pathlib import Path, PureWindowsPath
+from dataclasses import dataclass, field, fields, replace
+from typing import Callable, Optional, Union, get_args, get_origin, get_type_hints
+import json
+import os
+import threading
+
+CONFIG_PATH = Path("config.json")
+
+
+class ConfigError(ValueError):
+    """config.json is unreadable or has invalid values (all problems in one message)"""
+    def __init__(self, problems: list[str]):
+        super().__init__("Invalid configuration:\n" + "\n".join(f"- {p}" for p in problems))
+        self.problems = problems
+
+
+@dataclass(frozen=True)
+class PerformanceSettings:
+    """Throughput knobs; None worker counts mean "one per CPU" """
+    batch_workers: Optional[int] = field(default=None, metadata={"min": 1})
+    server_workers: Optional[int] = field(default=None, metadata={"min": 1})
+    server_queue_size: int = field(default=32, metadata={"min": 0})
+    writer_workers: int = field(default=1, metadata={"min": 1})
+    background_cache_mb: int = field(default=256, metadata={"min": 0})
+    # Simpan background sebagai pixel mentah ukuran kartu (~7 MB per file) untuk di-mmap
+    background_store: bool = False
+    render_cache_mb: int = field(default=1024, metadata={"min": 0})
+    line_mask_cache_mb: int = field(default=32, metadata={"min": 0})
+    preview_size: tuple[int, int] = field(default=(800, 600), metadata={"min": 16})
+    preview_delay_ms: int = field(default=150, metadata={"min": 0})
+
+
+@dataclass(frozen=True)
+class EncoderDefaults:
+    """Default output encoding; format None follows the output file extension"""
+    format: Optional[str] = field(default=None, metadata={"choices": ("PNG", "JPEG", "WEBP")})
+    quality: int = field(default=90, metadata={"min": 1, "max": 100})
+    compress_level: int = field(default=6, metadata={"min": 0, "max": 9})
+    progressive: bool = False
+    optimize: bool = False
+    subsampling: Optional[str] = field(default="4:2:0", metadata={"choices": ("4:4:4", "4:2:2", "4:2:0")})
+    lossless: bool = False
+    method: int = field(default=4, metadata={"min": 0, "max": 6})
+
+    def settings_for(self, path: Union[str, Path]):
+        """EncoderSettings for an output path (import PIL hanya saat dipakai)"""
+        from image_processor.encoder import EncoderSettings
+
+        options = {f.name: getattr(self, f.name) for f in fields(self) if f.name != "format"}
+        if self.format is None:
+            return EncoderSettings.for_path(path, **options)
+        return EncoderSettings(format=self.format, **options)
+
+
+@dataclass(frozen=True)
+class MetricsSettings:
+    enabled: bool = False
+    log: bool = False
+    prometheus_file: Optional[str] = None
+    status_bar: bool = True
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    """Immutable, validated view of config.json"""
+    backgrounds_dir: str = "backgrounds"
+    output_dir: str = "Quotes"
+    inbox_dir: str = "inbox"  # Folder yang diawasi python -m image_processor.watch
+    font_size: int = field(default=40, metadata={"min": 8, "max": 400})
+    font_family: str = "resource/PlusJakartaSans-SemiBold.ttf"
+    random_window: int = field(default=8, metadata={"min": 0})
+    near_duplicate_distance: int = field(default=10, metadata={"min": 0, "max": 64})
+    renditions: tuple[str, ...] = ("feed", "story", "thumb")
+    performance: PerformanceSettings = PerformanceSettings()
+    encoder: EncoderDefaults = EncoderDefaults()
+    metrics: MetricsSettings = MetricsSettings()
+
+    @property
+    def font_path(self) -> Path:
+        """font_family as a path on this OS (config lama memakai backslash Windows)"""
+        if "\\" in self.font_family:
+            return Path(*PureWindowsPath(self.font_family).parts)
+        return Path(self.font_family)
+
+    @property
+    def preview_size(self) -> tuple[int, int]:
+        return self.performance.preview_size
+
+    def to_dict(self) -> dict:
+        def convert(value):
+            if hasattr(value, "__dataclass_fields__"):
+                return {f.name: convert(getattr(value, f.name)) for f in fields(value)}
+            if isinstance(value, tuple):
+                return list(value)
+            return value
+        return convert(self)
+
+
+# Key datar dari config.json versi lama -> (section, key)
+LEGACY_KEYS = {
+    "background_cache_mb": ("performance", "background_cache_mb"),
+    "metrics_enabled": ("metrics", "enabled"),
+    "metrics_log": ("metrics", "log"),
+    "metrics_prometheus_file": ("metrics", "prometheus_file"),
+    "metrics_status_bar": ("metrics", "status_bar"),
+}
+
+
+def _coerce(value, hint, name: str, problems: list[str]):
+    """Check value against a type hint; returns the (tuple-converted) value"""
+    origin, args = get_origin(hint), get_args(hint)
+    if origin is Union:
+        if value is None and type(None) in args:
+            return None
+        inner = [a for a in args if a is not type(None)][0]
+        return _coerce(value, inner, name, problems)
+    if origin is tuple:
+        if not isinstance(value, (list, tuple)):
+            problems.append(f"{name}: expected a list, got {value!r}")
+            return value
+        if len(args) == 2 and args[1] is Ellipsis:
+            return tuple(_coerce(v, args[0], f"{name}[{i}]", problems) for i, v in enumerate(value))
+        if len(value) != len(args):
+            problems.append(f"{name}: expected {len(args)} items, got {len(value)}")
+            return tuple(value)
+        return tuple(_coerce(v, a, f"{name}[{i}]", problems) for i, (v, a) in enumerate(zip(value, args)))
+    # bool adalah subclass int di Python; jangan terima true sebagai angka
+    if hint is int and (isinstance(value, bool) or not isinstance(value, int)):
+        problems.append(f"{name}: expected an integer, got {value!r}")
+    elif hint is bool and not isinstance(value, bool):
+        problems.append(f"{name}: expected true/false, got {value!r}")
+    elif hint is str and not isinstance(value, str):
+        problems.append(f"{name}: expected a string, got {value!r}")
+    return value
+
+
+def _check_limits(value, meta: dict, name: str, problems: list[str]):
+    items = value if isinstance(value, tuple) else (value,)
+    for item in items:
+        if item is None or isinstance(item, bool):
+            continue
+        if "min" in meta and isinstance(item, int) and item < meta["min"]:
+            problems.append(f"{name}: must be >= {meta['min']}, got {item}")
+        if "max" in meta and isinstance(item, int) and item > meta["max"]:
+            problems.append(f"{name}: must be <= {meta['max']}, got {item}")
+        if "choices" in meta and item not in meta["choices"]:
+            problems.append(f"{name}: must be one of {', '.join(meta['choices'])}, got {item!r}")
+
+
+def _build(cls, data, prefix: str, problems: list[str]):
+    if not isinstance(data, dict):
+        problems.append(f"{prefix or 'config'}: expected an object")
+        return cls()
+    hints = get_type_hints(cls)
+    names = {f.name for f in fields(cls)}
+    for key in data:
+        if key not in names:
+            problems.append(f"{prefix}{key}: unknown setting")
+
+    values = {}
+    for f in fields(cls):
+        if f.name not in data:
+            continue
+        name = prefix + f.name
+        raw = data[f.name]
+        if hasattr(hints[f.name], "__dataclass_fields__"):
+            values[f.name] = _build(hints[f.name], raw, name + ".", problems)
+            continue
+        if f.name == "format" and isinstance(raw, str):
+            raw = raw.upper()
+        value = _coerce(raw, hints[f.name], name, problems)
+        _check_limits(value, f.metadata, name, problems)
+        values[f.name] = value
+    return replace(cls(), **values)
+
+
+def parse_config(data: dict) -> AppConfig:
+    """Validate a config.json object; raises ConfigError listing every problem"""
+    if not isinstance(data, dict):
+        raise ConfigError(["config: expected a JSON object"])
+    data = dict(data)
+    for key, (section, name) in LEGACY_KEYS.items():
+        if key in data:
+            value = data.pop(key)
+            section_data = dict(data.get(section) or {})
+            section_data.setdefault(name, value)
+            data[section] = section_data
+
+    problems: list[str] = []
+    config = _build(AppConfig, data, "", problems)
+    if problems:
+        raise ConfigError(problems)
+    return config
+
+
+def load_config(path: Union[str, Path] = CONFIG_PATH) -> AppConfig:
+    """Read and validate config.json"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except OSError as e:
+        raise ConfigError([f"{path}: {e.strerror or e}"])
+    except ValueError as e:
+        raise ConfigError([f"{path}: not valid JSON ({e})"])
+    return parse_config(data)
+
+
+def write_default_config(path: Union[str, Path] = CONFIG_PATH) -> AppConfig:
+    """Create config.json with every setting at its default"""
+    config = AppConfig()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config.to_dict(), f, indent=4)
+    return config
+
+
+class ConfigWatcher:
+    """Holds the current AppConfig and reloads it when the file's mtime changes.
+
+    An invalid edit keeps the previous config and is reported through
+    on_error, so a typo never takes the running app down. Call check()
+    from an existing loop (Tk after(), request handling) or start() for a
+    background polling thread. With strict=False an invalid file at start-up
+    falls back to the defaults and the problem is kept in .error.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = CONFIG_PATH,
+        on_change: Optional[Callable[[AppConfig, AppConfig], None]] = None,
+        on_error: Optional[Callable[[ConfigError], None]] = None,
+        create: bool = False,
+        strict: bool = True,
+    ):
+        self.path = Path(path)
+        self.on_change = on_change
+        self.on_error = on_error
+        self.error: Optional[Exception] = None
+        self._stop = threading.Event()
+        self._stamp = self._read_stamp()
+        try:
+            if self._stamp is None and create:
+                self.current = write_default_config(self.path)
+                self._stamp = self._read_stamp()
+            elif self._stamp is None:
+                self.current = AppConfig()
+            else:
+                self.current = load_config(self.path)
+        except (ConfigError, OSError) as e:
+            if strict:
+                raise
+            self.error = e
+            self.current = AppConfig()
+
+    def _read_stamp(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def check(self) -> bool:
+        """Reload if the file changed; True when a new config was applied"""
+        stamp = self._read_stamp()
+        if stamp is None or stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            config = load_config(self.path)
+        except ConfigError as e:
+            if self.on_error is not None:
+                self.on_error(e)
+            return False
+        if config == self.current:
+            return False
+        old, self.current = self.current, config
+        if self.on_change is not None:
+            self.on_change(old, config)
+        return True
+
+    def start(self, interval: float = 1.0):
+        """Poll in a daemon thread"""
+        def run():
+            while not self._stop.wait(interval):
+                self.check()
+        threading.Thread(target=run, name="config-watcher", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
@@ -2,6 +2,8 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, colorchooser
 from pathlib import Path
 
+from PIL import ImageTk
+
 class Controls:
     def __init__(self, parent, main_window):
         self.parent = parent
@@ -79,12 +81,15 @@ class Controls:
         filename = filedialog.askopenfilename(
             title="Select Background Image",
             filetypes=filetypes,
-            initialdir=self.main_window.config["backgrounds_dir"]
+            initialdir=self.main_window.config.backgrounds_dir
         )
 
         if filename:
             self.path_var.set(filename)
-            self.main_window.image_processor.load_background(filename)
+            try:
+                self.main_window.image_processor.load_background(filename)
+            except Exception as e:
+                messagebox.showerror("Error", str(e))
 
     def _load_random_background(self):
         """Load random background from default directory"""
@@ -104,9 +109,15 @@ class Controls:
             messagebox.showwarning("Warning", "Please enter some text for the quote")
             return
 
-        # Process image with quote
-        self.main_window.image_processor.add_text(quote_text, self.selected_color)
-        preview_image = self.main_window.image_processor.get_preview()
+        # Process image with quote (render core yang sama dengan Save)
+        processor = self.main_window.image_processor
+        processor.add_text(quote_text, self.selected_color)
+        try:
+            preview_image = ImageTk.PhotoImage(processor.get_preview())
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        processor.prefetch()
         self.main_window.preview_label.configure(image=preview_image)
         self.main_window.preview_label.image = preview_image
 
@@ -119,15 +130,18 @@ class Controls:
 
         # Save dialog
         file_path = filedialog.asksaveasfilename(
-            initialdir=self.main_window.config["output_dir"],
+            initialdir=self.main_window.config.output_dir,
             title="Save Quote Image",
             defaultextension=".png",
-            filetypes=[("JPG files", "*.jpg"), ("All files", "*.*")]
+            filetypes=[("PNG files", "*.png"), ("JPG files", "*.jpg"), ("All files", "*.*")]
         )
 
         if file_path:
             try:
-                self.main_window.image_processor.save_image(file_path)
+                # Tidak render ulang kalau teks/warna sama dengan preview terakhir
+                processor = self.main_window.image_processor
+                processor.add_text(quote_text, self.selected_color)
+                processor.save_image(file_path)
                 messagebox.showinfo("Success", "Quote image saved successfully!")
             except Exception as e:
                 messagebox.showerror("Error", f"Error saving image: {str(e)}")
@@ -137,4 +151,5 @@ class Controls:
         self.path_var.set("")
         self.text_input.delete("1.0", tk.END)
         self.selected_color = "#FFFFFF"
+        self.main_window.image_processor.clear()
         self.main_window.preview_label.configure(image="")
\ No newline at end of file
@@ -0,0 +1,211 @@
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+import queue
+import threading
+
+from PIL import ImageTk
+
+from image_processor.background_index import BackgroundIndex
+from image_processor.thumbnails import THUMBNAIL_SIZE, ThumbnailCache
+
+POLL_MS = 30            # Interval cek hasil worker
+MAX_PER_TICK = 8        # Maksimal thumbnail yang dipasang per tick, supaya main loop tidak tersendat
+PREFETCH_ROWS = 2       # Baris tambahan di atas/bawah area terlihat
+PADDING = 6
+
+
+class ThumbnailGallery(ttk.Frame):
+    """Scrollable, lazily loaded grid of background thumbnails.
+
+    Only rows inside (or near) the visible area are requested. Thumbnails are
+    produced by a thread pool and handed back through a queue that the Tk
+    loop drains with after(); worker threads never touch Tk objects.
+    """
+
+    def __init__(
+        self,
+        parent,
+        on_select: Callable[[Path], None],
+        thumb_size: tuple[int, int] = THUMBNAIL_SIZE,
+        columns: int = 2,
+        workers: int = 4,
+    ):
+        super().__init__(parent)
+        self.on_select = on_select
+        self.thumb_size = thumb_size
+        self.columns = columns
+        self.cell_w = thumb_size[0] + PADDING * 2
+        self.cell_h = thumb_size[1] + PADDING * 2
+
+        self.canvas = tk.Canvas(
+            self,
+            width=self.cell_w * columns,
+            highlightthickness=0,
+            background='#2b2b2b'
+        )
+        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self._paths: list[Path] = []
+        self._photos: dict[int, ImageTk.PhotoImage] = {}
+        self._items: dict[int, int] = {}
+        self._pending: dict[int, Future] = {}
+        self._generation = 0
+        self._paths_generation = None  # Generation dari daftar yang sedang ditampilkan
+        self._thumbs: Optional[ThumbnailCache] = None
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self._update_job = None
+
+        self.canvas.bind("<Configure>", lambda e: self._schedule_update())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Enter>", self._bind_wheel)
+        self.canvas.bind("<Leave>", self._unbind_wheel)
+        self.bind("<Destroy>", self._on_destroy)
+        self.after(POLL_MS, self._poll)
+
+    def set_directory(self, index: BackgroundIndex, cache_dir: Path):
+        """Show backgrounds from index; refreshing the index happens off the Tk thread"""
+        self._generation += 1
+        generation = self._generation
+        self._thumbs = ThumbnailCache(cache_dir, self.thumb_size)
+
+        def scan():
+            # Daftar nama file dulu (cepat), supaya galeri tidak kosong selama index
+            # mem-probe ribuan file; setelah refresh, file yang rusak dibuang dari daftar
+            self._results.put(("paths", generation, index.listed_paths()))
+            try:
+                index.refresh()
+            except Exception:
+                pass
+            self._results.put(("paths", generation, index.valid_paths()))
+
+        threading.Thread(target=scan, name="gallery-scan", daemon=True).start()
+
+    def _set_paths(self, paths: list[Path], generation: int):
+        paths = sorted(paths)
+        same_directory = generation == self._paths_generation
+        if same_directory and paths == self._paths:
+            return
+        # Update kedua untuk folder yang sama (setelah probe) tidak me-reset posisi scroll
+        top = self.canvas.yview()[0] if same_directory else 0.0
+        self._paths_generation = generation
+
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._photos.clear()
+        self._items.clear()
+        self.canvas.delete("all")
+
+        self._paths = paths
+        rows = -(-len(self._paths) // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, self.cell_w * self.columns, rows * self.cell_h))
+        self.canvas.yview_moveto(top)
+        self._schedule_update()
+
+    def _visible_indices(self) -> range:
+        top = self.canvas.canvasy(0)
+        bottom = top + max(self.canvas.winfo_height(), self.cell_h)
+        first_row = max(0, int(top // self.cell_h) - PREFETCH_ROWS)
+        last_row = int(bottom // self.cell_h) + PREFETCH_ROWS
+        return range(first_row * self.columns, min(len(self._paths), (last_row + 1) * self.columns))
+
+    def _schedule_update(self):
+        # Gabungkan event scroll/resize yang beruntun jadi satu update
+        if self._update_job is None:
+            self._update_job = self.after_idle(self._update_visible)
+
+    def _update_visible(self):
+        self._update_job = None
+        visible = self._visible_indices()
+
+        # Batalkan request yang sudah keluar dari layar
+        for i in [i for i in self._pending if i not in visible]:
+            self._pending.pop(i).cancel()
+
+        # Buang thumbnail yang jauh dari layar supaya memori tetap kecil
+        keep = range(max(0, visible.start - len(visible)), visible.stop + len(visible))
+        for i in [i for i in self._photos if i not in keep]:
+            self.canvas.delete(self._items.pop(i))
+            del self._photos[i]
+
+        generation = self._generation
+        for i in visible:
+            if i in self._photos or i in self._pending:
+                continue
+            future = self._executor.submit(self._thumbs.get, self._paths[i])
+            future.add_done_callback(
+                lambda f, i=i: None if f.cancelled() else self._results.put(("thumb", generation, i, f))
+            )
+            self._pending[i] = future
+
+    def _poll(self):
+        """Drain finished work on the Tk thread, a few items per tick"""
+        for _ in range(MAX_PER_TICK):
+            try:
+                message = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if message[1] != self._generation:
+                continue
+            if message[0] == "paths":
+                self._set_paths(message[2], message[1])
+            else:
+                self._place_thumbnail(message[2], message[3])
+        self.after(POLL_MS, self._poll)
+
+    def _place_thumbnail(self, i: int, future: Future):
+        # Hasil dari request lama (sudah diganti request baru) diabaikan
+        if self._pending.get(i) is not future:
+            return
+        del self._pending[i]
+        try:
+            image = future.result()
+        except Exception:
+            return
+        if i >= len(self._paths) or i not in self._visible_indices():
+            return
+        photo = ImageTk.PhotoImage(image)
+        row, col = divmod(i, self.columns)
+        x = col * self.cell_w + self.cell_w // 2
+        y = row * self.cell_h + self.cell_h // 2
+        self._photos[i] = photo
+        self._items[i] = self.canvas.create_image(x, y, image=photo)
+
+    def _on_click(self, event):
+        col = int(self.canvas.canvasx(event.x) // self.cell_w)
+        row = int(self.canvas.canvasy(event.y) // self.cell_h)
+        i = row * self.columns + col
+        if 0 <= col < self.columns and 0 <= i < len(self._paths):
+            self.on_select(self._paths[i])
+
+    def _on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self._schedule_update()
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.canvas.yview_scroll(-1, "units")
+        else:
+            self.canvas.yview_scroll(1, "units")
+        self._schedule_update()
+
+    def _bind_wheel(self, event):
+        self.canvas.bind_all("<MouseWheel>", self._on_wheel)
+        self.canvas.bind_all("<Button-4>", self._on_wheel)
+        self.canvas.bind_all("<Button-5>", self._on_wheel)
+
+    def _unbind_wheel(self, event):
+        self.canvas.unbind_all("<MouseWheel>")
+        self.canvas.unbind_all("<Button-4>")
+        self.canvas.unbind_all("<Button-5>")
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self._executor.shutdown(wait=False, cancel_futures=True)
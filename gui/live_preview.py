@@ -0,0 +1,111 @@
+import tkinter as tk
+from typing import Any, Callable, Optional
+import threading
+
+POLL_MS = 15            # Interval cek hasil render selama ada render yang berjalan
+DEBOUNCE_MS = 150       # Tunggu jeda ketikan sebelum render
+
+
+class LivePreview:
+    """Run preview renders on one worker thread with debouncing and supersession.
+
+    request() restarts a Tk after() timer, so a burst of keystrokes produces
+    a single render. Only the latest pending job is kept: a newer request
+    replaces any job that has not started yet, and results of renders that
+    were superseded while running are dropped. Finished images are handed to
+    on_ready on the Tk thread; the worker never touches Tk.
+    """
+
+    def __init__(self, root: tk.Misc, on_ready: Callable[[Any], None], delay_ms: int = DEBOUNCE_MS):
+        self.root = root
+        self.on_ready = on_ready
+        self.delay_ms = delay_ms
+        self.on_error: Optional[Callable[[Exception], None]] = None
+
+        self._generation = 0
+        self._job: Optional[tuple] = None
+        self._result: Optional[tuple] = None
+        self._running = False
+        self._cond = threading.Condition()
+        self._debounce_id = None
+        self._poll_id = None
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, name="live-preview", daemon=True)
+        self._worker.start()
+
+    def request(self, render: Callable[..., Any], *args, immediate: bool = False, **kwargs):
+        """Schedule render(*args, **kwargs); arguments must be captured on the Tk thread"""
+        if self._debounce_id is not None:
+            self.root.after_cancel(self._debounce_id)
+            self._debounce_id = None
+        if immediate:
+            self._submit(render, args, kwargs)
+        else:
+            self._debounce_id = self.root.after(self.delay_ms, self._submit, render, args, kwargs)
+
+    def cancel(self):
+        """Drop pending and in-flight renders"""
+        if self._debounce_id is not None:
+            self.root.after_cancel(self._debounce_id)
+            self._debounce_id = None
+        with self._cond:
+            self._generation += 1
+            self._job = None
+            self._result = None
+
+    def close(self):
+        self.cancel()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _submit(self, render, args, kwargs):
+        self._debounce_id = None
+        with self._cond:
+            self._generation += 1
+            # Job lama yang belum mulai langsung diganti (tidak pernah antre)
+            self._job = (self._generation, render, args, kwargs)
+            self._cond.notify()
+        if self._poll_id is None:
+            self._poll_id = self.root.after(POLL_MS, self._poll)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._job is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                generation, render, args, kwargs = self._job
+                self._job = None
+                self._running = True
+
+            try:
+                outcome = (generation, render(*args, **kwargs), None)
+            except Exception as e:
+                outcome = (generation, None, e)
+
+            with self._cond:
+                self._running = False
+                # Hasil render yang sudah basi dibuang
+                if generation == self._generation:
+                    self._result = outcome
+
+    def _poll(self):
+        with self._cond:
+            result, self._result = self._result, None
+            busy = self._job is not None or self._running
+            current = self._generation
+
+        if result is not None and result[0] == current:
+            if result[2] is not None:
+                if self.on_error is not None:
+                    self.on_error(result[2])
+            else:
+                self.on_ready(result[1])
+
+        if busy and not self._closed:
+            self._poll_id = self.root.after(POLL_MS, self._poll)
+        else:
+            self._poll_id = None
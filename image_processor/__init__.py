@@ -1,2 +1,55 @@
 # image_processor/__init__.py
-# File ini sengaja dikosongkan.
\ No newline at end of file
+"""Tk-free quote card rendering.
+
+Submodules are imported on first attribute access so that importing the
+package (GUI start-up, short CLI runs) does not pull in PIL until needed.
+"""
+import importlib
+
+# metrics hanya butuh stdlib, jadi aman di-import langsung
+from .metrics import Metrics, metrics
+
+_EXPORTS = {
+    "BackgroundIndex": "background_index",
+    "BackgroundStore": "background_store",
+    "BackgroundCache": "cache",
+    "LayeredCompositor": "compositor",
+    "LineMaskCache": "compositor",
+    "background_cache": "cache",
+    "EncoderSettings": "encoder",
+    "ImageWriter": "encoder",
+    "TextLayout": "layout",
+    "fit_text": "layout",
+    "Card": "processor",
+    "ImageProcessor": "processor",
+    "ResourceRegistry": "resources",
+    "BackgroundRotation": "rotation",
+    "ThumbnailCache": "thumbnails",
+    "Rendition": "renditions",
+    "RenderJob": "renderer",
+    "RenderResult": "renderer",
+    "compose_quote": "renderer",
+    "layout_quote": "renderer",
+    "open_background": "renderer",
+    "render_batch": "renderer",
+    "render_preview": "renderer",
+    "split_text_into_lines": "renderer",
+    "InboxWatcher": "watch",
+    "assign_shards": "shard",
+    "stream_render": "stream",
+}
+
+__all__ = ["Metrics", "metrics", *_EXPORTS]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
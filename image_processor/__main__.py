@@ -0,0 +1,158 @@
+# image_processor/__main__.py
+"""Headless batch rendering.
+
+Usage: python -m image_processor jobs.json [--output-dir Quotes] [--workers N]
+                                  [--format png|jpeg|webp] [--quality Q] ...
+
+jobs.json berisi list object: {"text": ..., "background": ..., "color": ..., "output_path": ...}
+"color": "auto" memilih warna teks otomatis; --scrim menambah gradient di belakang teks.
+Job tanpa "background" mendapat background dari --backgrounds lewat shuffle-bag
+(tanpa pengulangan dan tanpa foto yang hampir sama berdekatan). Urutan acaknya
+di-seed dari isi job, jadi file yang sama mendapat background yang sama setiap run.
+--renditions feed,story,thumb menulis semua ukuran dari satu komposisi per kartu.
+Kartu yang input-nya tidak berubah diambil dari <output-dir>/.render_cache (--no-cache
+untuk mematikan).
+Untuk input yang sangat besar: python -m image_processor.stream (JSONL, memori konstan).
+--shard-index I --shard-count N merender satu bagian manifest (lihat image_processor/shard.py)
+dan menulis manifest output dengan checksum untuk langkah merge.
+--ingest menyimpan background (folder --backgrounds dan folder background job) ke
+pixel store dulu, supaya worker memetakannya tanpa decode JPEG.
+Default semua opsi diambil dari config.json (lihat config/settings.py).
+"""
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+from config import AppConfig, ConfigError, load_config
+from config.settings import CONFIG_PATH
+from .encoder import add_encoder_arguments, encoder_from_args, set_encoder_defaults
+from .render_cache import RENDER_CACHE_DIRNAME, RenderCache
+from .renderer import RenderJob, render_batch, summarize_encoding
+from .renditions import PRESETS, parse_renditions
+
+
+def main(argv=None) -> int:
+    try:
+        config = load_config() if CONFIG_PATH.exists() else AppConfig()
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        return 2
+    perf = config.performance
+
+    parser = argparse.ArgumentParser(description="Render quote cards without the GUI")
+    parser.add_argument("jobs", help="JSON file with a list of jobs")
+    parser.add_argument("--output-dir", default=config.output_dir)
+    parser.add_argument("--workers", type=int, default=perf.batch_workers)
+    parser.add_argument("--font-size", type=int, default=config.font_size)
+    parser.add_argument("--scrim", action="store_true", help="add a gradient behind low-contrast text")
+    parser.add_argument("--backgrounds", default=config.backgrounds_dir,
+                        help="directory for jobs without a background")
+    parser.add_argument("--window", type=int, default=config.random_window,
+                        help="recent picks that must not contain a near-duplicate")
+    parser.add_argument("--max-distance", type=int, default=config.near_duplicate_distance,
+                        help="hash distance (bits) below which backgrounds count as near-duplicates")
+    parser.add_argument("--renditions", type=parse_renditions, default=None,
+                        help=f"comma-separated output sizes from one composite ({', '.join(PRESETS)})")
+    parser.add_argument("--ingest", action=argparse.BooleanOptionalAction, default=perf.background_store,
+                        help="sync the memory-mapped background store before rendering")
+    parser.add_argument("--no-cache", action="store_true", help="always render, ignore the render cache")
+    parser.add_argument("--cache-dir", default=None, help=f"render cache (default: <output-dir>/{RENDER_CACHE_DIRNAME})")
+    parser.add_argument("--cache-mb", type=int, default=perf.render_cache_mb,
+                        help="render cache size limit in MB")
+    parser.add_argument("--shard-index", type=int, default=None, help="render only this shard of the manifest")
+    parser.add_argument("--shard-count", type=int, default=None, help="number of shards the manifest is split into")
+    add_encoder_arguments(parser)
+    set_encoder_defaults(parser, config.encoder)
+    args = parser.parse_args(argv)
+    settings = encoder_from_args(args)
+
+    sharded = args.shard_index is not None or args.shard_count is not None
+    if sharded:
+        from .shard import load_manifest, select_shard, write_shard_manifest
+
+        if args.shard_index is None or args.shard_count is None or args.shard_count < 1:
+            parser.error("--shard-index and --shard-count must be given together (count >= 1)")
+        manifest = load_manifest(args.jobs)
+        # Shuffle-bag per node akan memilih background berbeda; harus sudah tetap di manifest
+        if any(not job.get("background") for job in manifest):
+            print("Every job needs a background for sharded runs; "
+                  "run python -m image_processor.shard plan first", file=sys.stderr)
+            return 2
+        try:
+            items = select_shard(manifest, args.shard_index, args.shard_count)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        with open(args.jobs, "r", encoding="utf-8") as f:
+            items = json.load(f)
+
+    missing = [item for item in items if not item.get("background")]
+    if missing:
+        from .background_index import BackgroundIndex
+        from .rotation import BackgroundRotation
+
+        # Seed dari isi job: run ulang memilih background yang sama, jadi render cache tetap kena
+        seed = hashlib.sha256(json.dumps(missing, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        rotation = BackgroundRotation(BackgroundIndex(args.backgrounds), args.window, args.max_distance,
+                                      rng=random.Random(seed))
+        backgrounds = rotation.take(len(missing))
+        if len(backgrounds) < len(missing):
+            print(f"No valid backgrounds in {args.backgrounds}", file=sys.stderr)
+            return 2
+        for item, background in zip(missing, backgrounds):
+            item["background"] = str(background)
+    jobs = []
+    for item in items:
+        fields = {key: value for key, value in item.items() if key != "id"}
+        if sharded and not fields.get("output_path"):
+            # Nama dari id job: sama di setiap node dan saat job di-re-queue
+            extension = settings.extension if settings else ".png"
+            fields["output_path"] = str(Path(args.output_dir) / f"quote_{item['id']}{extension}")
+        jobs.append(RenderJob(**fields))
+
+    if args.ingest:
+        from .background_store import BackgroundStore
+
+        directories = {Path(args.backgrounds).resolve()} | {Path(job.background).resolve().parent for job in jobs}
+        for directory in sorted(directories):
+            counts = BackgroundStore(directory).sync(workers=args.workers or os.cpu_count() or 1)
+            if counts["added"] or counts["updated"] or counts["failed"]:
+                print(f"Ingested {directory}: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+
+    cache = None
+    if not args.no_cache:
+        cache = RenderCache(args.cache_dir or Path(args.output_dir) / RENDER_CACHE_DIRNAME,
+                            args.cache_mb * 1024 * 1024)
+
+    start = time.perf_counter()
+    results = render_batch(jobs, output_dir=args.output_dir, workers=args.workers, font_size=args.font_size,
+                           encoder=settings, scrim=args.scrim, renditions=args.renditions,
+                           cache=cache, font_path=config.font_path)
+    elapsed = time.perf_counter() - start
+    if sharded:
+        path = write_shard_manifest(args.output_dir, manifest, items, results, args.shard_index, args.shard_count)
+        print(f"Shard {args.shard_index}/{args.shard_count}: {len(items)} jobs, "
+              f"{len({job.background for job in jobs})} backgrounds, manifest {path}")
+
+    failed = [r for r in results if not r.ok]
+    for result in failed:
+        print(f"[{result.index}] {result.error}", file=sys.stderr)
+    print(f"Rendered {len(results) - len(failed)}/{len(results)} cards in {elapsed:.2f}s")
+    if cache is not None:
+        cached = sum(1 for r in results if r.cached)
+        print(f"  render cache: {cached} hits, {len(results) - cached} misses")
+    for fmt, stats in summarize_encoding(results).items():
+        print(
+            f"  {fmt}: {stats['count']} images, {stats['encode_ms']:.1f} ms/image encode, "
+            f"{stats['images_per_second']:.1f} images/s per writer, {stats['avg_bytes'] / 1024:.0f} KiB avg"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+# image_processor/background_index.py
+"""Persistent, incrementally updated index of the backgrounds directory."""
+from pathlib import Path
+from typing import Optional, Union
+import json
+import os
+import random
+import threading
+
+from PIL import Image
+
+SUPPORTED_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+INDEX_FILENAME = ".background_index.json"
+INDEX_VERSION = 2  # v2: dhash per entry
+
+HASH_SIZE = 8  # 8x8 perbandingan -> hash 64 bit
+
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash: brightness gradients of a tiny grayscale thumbnail.
+
+    Near-identical shots (same scene, slight crop or exposure change) end up
+    a few bits apart, so Hamming distance works as a similarity measure.
+    """
+    # JPEG: decode langsung di skala kecil, cukup untuk thumbnail 9x8
+    image.draft("L", (hash_size * 8, hash_size * 8))
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class HammingTree:
+    """BK-tree over integer hashes for radius queries under Hamming distance"""
+
+    def __init__(self):
+        self._root = None  # [hash, items, {distance: child}]
+        self._size = 0
+
+    def add(self, value: int, item):
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> list[tuple[int, object]]:
+        """All (distance, item) with distance <= radius"""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.extend((distance, item) for item in node[1])
+            # Ketidaksamaan segitiga: hanya cabang di [d - r, d + r] yang mungkin cocok
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def probe_image(path: Path) -> dict:
+    """Read header metadata, check the file decodes and hash it; never raises"""
+    stat = path.stat()
+    entry = {
+        "bytes": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "width": None,
+        "height": None,
+        "mode": None,
+        "valid": False,
+        "error": None,
+        "dhash": None,
+    }
+    if stat.st_size == 0:
+        entry["error"] = "empty file"
+        return entry
+    try:
+        with Image.open(path) as image:
+            entry["width"], entry["height"] = image.size
+            entry["mode"] = image.mode
+            # verify() hanya memeriksa struktur (mis. CRC chunk PNG); data JPEG tidak di-decode
+            image.verify()
+        # verify() membuat image tidak bisa dipakai lagi, jadi buka ulang. load() men-decode
+        # seluruh stream (JPEG cukup di skala draft), jadi file terpotong gagal di sini
+        with Image.open(path) as image:
+            image.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+            image.load()
+            entry["dhash"] = f"{dhash(image):016x}"
+        entry["valid"] = True
+    except Exception as e:
+        entry["error"] = str(e)
+    return entry
+
+
+class BackgroundIndex:
+    """On-disk metadata index for background images with O(1) random selection.
+
+    Only files whose mtime or size changed since the last refresh are opened
+    again. random_choice() picks among valid entries only and rescans the
+    directory only when the directory itself was modified (file added,
+    removed or renamed).
+
+    Each entry stores a perceptual hash, so near-duplicate lookups
+    (near_duplicates) never decode an image once the index is built.
+    generation changes whenever the set of valid entries does.
+
+    Files are probed without holding the index lock, so lookups keep
+    answering from the current entries while a (possibly long) scan runs;
+    only the final swap is locked. One scan runs at a time.
+    """
+
+    def __init__(self, directory: Union[str, Path], index_path: Optional[Union[str, Path]] = None):
+        self.directory = Path(directory).resolve()
+        self.index_path = Path(index_path) if index_path else self.directory / INDEX_FILENAME
+        self.entries: dict[str, dict] = {}
+        self._valid: list[str] = []
+        self._dir_mtime_ns: Optional[int] = None
+        self._tree: Optional[HammingTree] = None
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load the stored index, ignoring a missing or unreadable file"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.entries = data.get("entries", {})
+                self._dir_mtime_ns = data.get("dir_mtime_ns")
+        except (OSError, ValueError):
+            self.entries = {}
+            self._dir_mtime_ns = None
+        self._rebuild_valid()
+
+    def save(self):
+        """Write the index atomically"""
+        data = {
+            "version": INDEX_VERSION,
+            "dir_mtime_ns": self._dir_mtime_ns,
+            "entries": self.entries,
+        }
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+            if self.index_path.parent.resolve() == self.directory:
+                # Menulis index ikut mengubah mtime folder; jangan dianggap perubahan
+                self._dir_mtime_ns = self.directory.stat().st_mtime_ns
+        except OSError:
+            # Folder read-only (mis. network share): index tetap dipakai di memori
+            pass
+
+    def _rebuild_valid(self):
+        self._valid = [name for name, entry in self.entries.items() if entry.get("valid")]
+        self._tree = None
+        self.generation += 1
+
+    @property
+    def scanning(self) -> bool:
+        return self._scan_lock.locked()
+
+    def refresh(self, force: bool = False, wait: bool = True) -> dict:
+        """Bring the index up to date with the directory in a single scan.
+
+        Returns counts of added, updated and removed entries. With
+        wait=False nothing is done when another scan is already running.
+        """
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        if not self._scan_lock.acquire(blocking=wait):
+            return counts
+        try:
+            if not self.directory.is_dir():
+                return counts
+            # Diambil sebelum scan: perubahan selama scan memicu refresh berikutnya
+            dir_mtime_ns = self.directory.stat().st_mtime_ns
+            with self._lock:
+                known = {name: (entry["mtime_ns"], entry["bytes"]) for name, entry in self.entries.items()}
+
+            # Probe (decode) tanpa lock: random_choice dan lookup lain tetap jalan selama scan
+            seen = set()
+            probed = {}
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if not item.is_file() or not item.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        continue
+                    seen.add(item.name)
+                    stat = item.stat()
+                    if not force and known.get(item.name) == (stat.st_mtime_ns, stat.st_size):
+                        continue
+                    probed[item.name] = probe_image(Path(item.path))
+                    counts["updated" if item.name in known else "added"] += 1
+
+            with self._lock:
+                self.entries.update(probed)
+                for name in [name for name in self.entries if name not in seen]:
+                    del self.entries[name]
+                    counts["removed"] += 1
+                self._rebuild_valid()
+                self._dir_mtime_ns = dir_mtime_ns
+                if any(counts.values()) or not self.index_path.exists():
+                    # save() mencatat mtime folder setelah menulis index, kecuali ada
+                    # file yang berubah selama scan: itu harus terlihat di refresh berikutnya
+                    changed_during_scan = self._directory_changed()
+                    self.save()
+                    if changed_during_scan:
+                        self._dir_mtime_ns = dir_mtime_ns
+            return counts
+        finally:
+            self._scan_lock.release()
+
+    def _directory_changed(self) -> bool:
+        try:
+            return self.directory.stat().st_mtime_ns != self._dir_mtime_ns
+        except OSError:
+            return False
+
+    def refresh_if_changed(self, wait: bool = True) -> bool:
+        """Rescan only when the directory was modified since the last scan"""
+        if self._dir_mtime_ns is None or self._directory_changed():
+            self.refresh(wait=wait)
+            return True
+        return False
+
+    def mark_invalid(self, path: Union[str, Path], error: str = "failed to load"):
+        """Exclude a file that turned out to be unreadable (only files in this directory)"""
+        try:
+            relative = Path(path).resolve().relative_to(self.directory)
+        except ValueError:
+            return  # File di luar folder ini; nama yang sama di sini tidak ada hubungannya
+        name = relative.as_posix()
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry.get("valid"):
+                entry["valid"] = False
+                entry["error"] = error
+                self._rebuild_valid()
+                self.save()
+
+    def invalid_reason(self, path: Union[str, Path]) -> Optional[str]:
+        """Why a file in this directory is known to be unusable, or None.
+
+        Only answers from the index while the file is unchanged since it was
+        probed; a replaced or new file returns None until the next refresh.
+        """
+        try:
+            path = Path(path).resolve()
+            name = path.relative_to(self.directory).as_posix()
+            stat = path.stat()
+        except (ValueError, OSError):
+            return None
+        entry = self.entries.get(name)
+        if entry is None or entry.get("valid"):
+            return None
+        if (entry.get("mtime_ns"), entry.get("bytes")) != (stat.st_mtime_ns, stat.st_size):
+            return None
+        return entry.get("error") or "not a valid image"
+
+    def listed_paths(self) -> list[Path]:
+        """Every image file in the directory, from a directory listing only (no probing)"""
+        try:
+            with os.scandir(self.directory) as it:
+                return [Path(item.path) for item in it
+                        if item.name.lower().endswith(SUPPORTED_EXTENSIONS) and item.is_file()]
+        except OSError:
+            return []
+
+    def valid_paths(self) -> list[Path]:
+        return [self.directory / name for name in self._valid]
+
+    def valid_names(self) -> list[str]:
+        return list(self._valid)
+
+    def hash_of(self, name: str) -> Optional[int]:
+        entry = self.entries.get(name)
+        if entry is None or not entry.get("dhash"):
+            return None
+        return int(entry["dhash"], 16)
+
+    def near_duplicates(self, name: str, max_distance: int) -> list[str]:
+        """Valid entries whose hash is within max_distance bits of name's (name included)"""
+        value = self.hash_of(name)
+        if value is None:
+            return [name]
+        with self._lock:
+            tree = self._tree
+            if tree is None:
+                tree = HammingTree()
+                for other in self._valid:
+                    other_hash = self.hash_of(other)
+                    if other_hash is not None:
+                        tree.add(other_hash, other)
+                self._tree = tree
+        found = [item for _, item in tree.search(value, max_distance)]
+        return found if name in found else [name, *found]
+
+    def random_choice(self, rng: Optional[random.Random] = None, refresh: bool = True) -> Optional[Path]:
+        """Pick a random valid background, or None when there is none.
+
+        refresh=False picks from the current entries without touching the
+        disk (for the Tk thread; refresh on a worker instead).
+        """
+        if refresh:
+            self.refresh_if_changed()
+        if not self._valid:
+            return None
+        return self.directory / (rng or random).choice(self._valid)
+
+    def __len__(self) -> int:
+        return len(self._valid)
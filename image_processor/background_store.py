@@ -0,0 +1,267 @@
+# image_processor/background_store.py
+"""Backgrounds pre-normalized to the card size and memory-mapped as raw pixels.
+
+Usage: python -m image_processor.background_store [backgrounds] [--workers N]
+"""
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union
+import hashlib
+import json
+import mmap
+import os
+import sys
+import threading
+
+from PIL import Image
+
+from .metrics import metrics
+
+# Ukuran kartu = ukuran watermark Img-3.png; semua posisi teks mengacu ke sini
+CARD_SIZE = (1200, 1500)
+
+STORE_DIRNAME = ".pixel_store"
+MANIFEST_NAME = "store.json"
+STORE_VERSION = 1
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Pillow hanya bisa memetakan buffer tanpa copy untuk layout 4 byte per pixel
+RAW_MODE = "RGBX"
+
+# Setiap map memegang satu file descriptor; jauh di bawah ulimit default (256 di macOS)
+MAX_MAPS = 32
+
+
+def cover_box(size: tuple[int, int], target: tuple[int, int]) -> tuple[float, float, float, float]:
+    """Centered crop of size with target's aspect ratio (for resize(box=...))"""
+    width, height = size
+    scale = max(target[0] / width, target[1] / height)
+    crop_w, crop_h = target[0] / scale, target[1] / scale
+    left, top = (width - crop_w) / 2, (height - crop_h) / 2
+    return (left, top, left + crop_w, top + crop_h)
+
+
+def normalize(image: Image.Image, size: tuple[int, int] = CARD_SIZE) -> Image.Image:
+    """Crop to the card's aspect ratio and resize to the card size (RGB)"""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if image.size == size:
+        return image
+    return image.resize(size, Image.Resampling.LANCZOS, box=cover_box(image.size, size), reducing_gap=3.0)
+
+
+def _entry_filename(name: str) -> str:
+    return hashlib.sha1(name.encode("utf-8")).hexdigest()[:20] + ".rgbx"
+
+
+def _ingest(source: str, target: str, size: tuple[int, int]):
+    """Worker: decode one background, normalize it and write its raw pixels"""
+    # Decode penuh (tanpa draft) supaya hasilnya sama persis dengan open_background
+    with Image.open(source) as image:
+        data = normalize(image, size).tobytes("raw", RAW_MODE)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    # Proses lain yang masih memetakan file lama tetap memegang inode lamanya
+    os.replace(tmp_path, target)
+
+
+class BackgroundStore:
+    """Raw card-size pixels for every background in a directory.
+
+    sync() decodes, crops and resizes only the files whose mtime or size
+    changed since the last sync and drops entries for deleted files. open()
+    maps an entry read-only: no decode, no copy, and every process that maps
+    the same file shares its pages through the OS page cache. Entries that
+    are stale (source changed after the last sync) are never returned.
+
+    The last max_maps opened entries are kept mapped (LRU). An evicted map
+    is closed by the garbage collector once no image uses it any more, so
+    open file descriptors stay bounded in long-running processes.
+    """
+
+    def __init__(self, directory: Union[str, Path], store_dir: Optional[Union[str, Path]] = None,
+                 size: tuple[int, int] = CARD_SIZE, max_maps: int = MAX_MAPS):
+        self.directory = Path(directory).resolve()
+        self.store_dir = Path(store_dir) if store_dir else self.directory / STORE_DIRNAME
+        self.manifest_path = self.store_dir / MANIFEST_NAME
+        self.size = size
+        self.entries: dict[str, dict] = {}
+        self._manifest_stamp = None
+        self.max_maps = max_maps
+        self._maps: "OrderedDict[str, tuple]" = OrderedDict()   # nama -> (stamp, mmap, image)
+        self._lock = threading.Lock()
+
+    def _load_manifest(self):
+        """Re-read the manifest when another process rewrote it"""
+        try:
+            stat = self.manifest_path.stat()
+        except OSError:
+            self.entries, self._manifest_stamp = {}, None
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._manifest_stamp:
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") == STORE_VERSION and tuple(data.get("size", ())) == self.size:
+            self.entries = data.get("entries", {})
+        else:
+            self.entries = {}
+        self._manifest_stamp = stamp
+
+    def _save_manifest(self):
+        data = {"version": STORE_VERSION, "size": list(self.size), "entries": self.entries}
+        tmp_path = self.manifest_path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.manifest_path)
+        stat = self.manifest_path.stat()
+        self._manifest_stamp = (stat.st_mtime_ns, stat.st_size)
+
+    def sync(self, workers: int = 1) -> dict:
+        """Bring the store up to date with the directory.
+
+        Returns counts of added, updated, removed and failed entries.
+        """
+        counts = {"added": 0, "updated": 0, "removed": 0, "failed": 0}
+        if not self.directory.is_dir():
+            return counts
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            self._load_manifest()
+            pending = []
+            seen = set()
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if not item.is_file() or not item.name.lower().endswith(SOURCE_EXTENSIONS):
+                        continue
+                    seen.add(item.name)
+                    stat = item.stat()
+                    old = self.entries.get(item.name)
+                    if old is not None and old["mtime_ns"] == stat.st_mtime_ns and old["bytes"] == stat.st_size:
+                        continue
+                    entry = {"file": _entry_filename(item.name), "mtime_ns": stat.st_mtime_ns, "bytes": stat.st_size}
+                    pending.append((item.name, entry, old is not None))
+
+            def finish(name, entry, existed, error):
+                if error is not None:
+                    counts["failed"] += 1
+                    # File rusak dicatat supaya tidak di-decode ulang sampai berubah
+                    (self.store_dir / entry["file"]).unlink(missing_ok=True)
+                    self.entries[name] = {**entry, "file": None, "error": str(error)}
+                    return
+                self.entries[name] = entry
+                counts["updated" if existed else "added"] += 1
+
+            if workers > 1 and len(pending) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [
+                        (pool.submit(_ingest, str(self.directory / name), str(self.store_dir / entry["file"]), self.size),
+                         name, entry, existed)
+                        for name, entry, existed in pending
+                    ]
+                    for future, name, entry, existed in futures:
+                        finish(name, entry, existed, future.exception())
+            else:
+                for name, entry, existed in pending:
+                    try:
+                        _ingest(str(self.directory / name), str(self.store_dir / entry["file"]), self.size)
+                        error = None
+                    except Exception as e:
+                        error = e
+                    finish(name, entry, existed, error)
+
+            for name in [name for name in self.entries if name not in seen]:
+                entry = self.entries.pop(name)
+                if entry["file"]:
+                    (self.store_dir / entry["file"]).unlink(missing_ok=True)
+                counts["removed"] += 1
+
+            if any(counts.values()) or not self.manifest_path.exists():
+                self._save_manifest()
+        return counts
+
+    def open(self, path: Union[str, Path]) -> Optional[Image.Image]:
+        """Read-only card-size image mapped from the store, or None if not stored/stale"""
+        path = Path(path)
+        if path.parent.resolve() != self.directory:
+            return None
+        name = path.name
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._maps.get(name)
+            if cached is not None and cached[0] == stamp:
+                self._maps.move_to_end(name)
+                return cached[2]
+            self._load_manifest()
+            entry = self.entries.get(name)
+            if entry is None or not entry["file"] or (entry["mtime_ns"], entry["bytes"]) != stamp:
+                return None
+            try:
+                with metrics.stage("map_background"):
+                    with open(self.store_dir / entry["file"], "rb") as f:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    image = Image.frombuffer(RAW_MODE, self.size, mapped, "raw", RAW_MODE, 0, 1)
+            except (OSError, ValueError):
+                return None
+            # Map lama tidak ditutup di sini: gambar yang masih dipakai tetap valid sampai di-GC
+            self._maps[name] = (stamp, mapped, image)
+            self._maps.move_to_end(name)
+            while len(self._maps) > self.max_maps:
+                self._maps.popitem(last=False)
+            return image
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load_manifest()
+            return sum(1 for entry in self.entries.values() if entry["file"])
+
+
+_stores: dict[Path, BackgroundStore] = {}
+_stores_lock = threading.Lock()
+
+
+def mapped_background(path: Union[str, Path]) -> Optional[Image.Image]:
+    """The stored pixels for path if its directory has an up-to-date store entry"""
+    directory = Path(path).parent.resolve()
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            if not (directory / STORE_DIRNAME / MANIFEST_NAME).exists():
+                return None
+            store = _stores[directory] = BackgroundStore(directory)
+    return store.open(path)
+
+
+def main(argv=None) -> int:
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Pre-normalize backgrounds into the memory-mapped pixel store")
+    parser.add_argument("directory", nargs="?", default="backgrounds")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    store = BackgroundStore(args.directory)
+    counts = store.sync(workers=args.workers)
+    print(
+        f"{len(store)} backgrounds in {store.store_dir} ({time.perf_counter() - start:.2f}s): "
+        + ", ".join(f"{count} {name}" for name, count in counts.items())
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
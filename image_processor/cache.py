@@ -0,0 +1,124 @@
+# image_processor/cache.py
+"""Decoded background cache with LRU eviction against a byte budget."""
+from pathlib import Path
+from collections import OrderedDict
+from typing import Optional, Union
+import threading
+
+from PIL import Image
+
+from .compositor import compositor
+from .renderer import open_background
+
+DEFAULT_BUDGET_BYTES = 256 * 1024 * 1024
+
+
+def image_nbytes(image: Image.Image) -> int:
+    """Approximate memory used by a decoded image"""
+    # Gambar dari pixel store ikut dihitung: setiap map memegang file descriptor dan
+    # pixel-nya tetap resident; tanpa batas cache ini tidak pernah melepasnya
+    return image.width * image.height * len(image.getbands())
+
+
+class BackgroundCache:
+    """Thread-safe LRU cache of decoded backgrounds keyed by (path, mtime, size).
+
+    The budget also covers the composited bases the compositor builds from
+    cached backgrounds: they count towards it, and evicting a background
+    drops its bases.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: Path, max_size: Optional[tuple[int, int]] = None) -> tuple:
+        stat = path.stat()
+        return (str(path), stat.st_mtime_ns, stat.st_size, max_size)
+
+    def get(self, path: Union[str, Path], max_size: Optional[tuple[int, int]] = None) -> Image.Image:
+        """Return the decoded background, decoding only on a miss.
+
+        max_size selects a reduced-scale proxy decode (cached separately from
+        the full-resolution image). The returned image is shared; callers
+        must copy before drawing on it.
+        """
+        path = Path(path).resolve()
+        key = self._key(path, max_size)
+
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        image = open_background(path, max_size)
+        self.put(key, image)
+        return image
+
+    def put(self, key: tuple, image: Image.Image):
+        """Insert a decoded image and evict least recently used entries over budget"""
+        size = image_nbytes(image)
+        with self._lock:
+            # Versi lama dari file yang sama (mtime/size berbeda) langsung dibuang
+            for stale in [k for k in self._entries if k[0] == key[0] and k[1:3] != key[1:3]]:
+                self._discard(stale)
+            if key in self._entries:
+                self._discard(key)
+            if size > self.budget_bytes:
+                return
+            self._entries[key] = image
+            self.current_bytes += size
+            while self._entries and self.current_bytes + compositor.base_bytes > self.budget_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def _discard(self, key: tuple):
+        image = self._entries.pop(key)
+        self.current_bytes -= image_nbytes(image)
+        compositor.forget(image)
+
+    def resize(self, budget_bytes: int):
+        """Change the byte budget, evicting immediately if needed"""
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            while self._entries and self.current_bytes + compositor.base_bytes > self.budget_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for image in self._entries.values():
+                compositor.forget(image)
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "base_bytes": compositor.base_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Cache bersama untuk satu proses
+background_cache = BackgroundCache()
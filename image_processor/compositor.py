@@ -0,0 +1,278 @@
+# image_processor/compositor.py
+"""Layered card compositing: cached background+watermark base, text as its own layer."""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+import threading
+import weakref
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .layout import TextLayout
+
+DEFAULT_LINE_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class LineMaskCache:
+    """Byte-bounded LRU of rasterized text lines keyed by (font file, size, text).
+
+    Quotes repeat a lot of whole lines (attributions, hashtags, series
+    taglines); a hit skips FreeType entirely. Masks are coverage only, so
+    the same entry serves every colour. Entries are shared and read-only.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_LINE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(font: ImageFont.FreeTypeFont, line: str) -> tuple:
+        return (getattr(font, "path", id(font)), font.size, line)
+
+    def get(self, font: ImageFont.FreeTypeFont, line: str) -> tuple[Image.Image, tuple[int, int, int, int]]:
+        """(mask, bbox) of line drawn at the origin; bbox as returned by font.getbbox"""
+        key = self._key(font, line)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        left, top, right, bottom = font.getbbox(line)
+        mask = Image.new("L", (max(0, right - left), max(0, bottom - top)), 0)
+        ImageDraw.Draw(mask).text((-left, -top), line, font=font, fill=255)
+        entry = (mask, (left, top, right, bottom))
+
+        size = mask.width * mask.height
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = entry
+                self.current_bytes += size
+                self._evict()
+        return entry
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            mask, _ = self._entries.popitem(last=False)[1]
+            self.current_bytes -= mask.width * mask.height
+            self.evictions += 1
+
+    def resize(self, max_bytes: int):
+        """Change the byte budget, evicting immediately if needed"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Cache bersama untuk satu proses
+line_masks = LineMaskCache()
+
+
+@dataclass(frozen=True)
+class TextLayer:
+    """Rasterized text coverage (mode "L") and where it goes on the card"""
+    mask: Image.Image
+    box: tuple[int, int, int, int]
+
+    @property
+    def area(self) -> int:
+        return self.mask.width * self.mask.height
+
+
+def rasterize_text(layout: TextLayout, font: ImageFont.FreeTypeFont,
+                   lines: Optional[LineMaskCache] = None) -> Optional[TextLayer]:
+    """Assemble the laid-out lines into a mask covering only the text block.
+
+    Each line comes from the line mask cache (drawn once per font, size and
+    text) and is blended in with paste(255, box, mask), which matches what
+    drawing the text directly into the mask would produce.
+    """
+    lines = lines or line_masks
+    placed = []
+    y = layout.y
+    for line in layout.lines:
+        if line:
+            mask, (left, top, right, bottom) = lines.get(font, line)
+            placed.append((mask, (layout.x + left, y + top, layout.x + right, y + bottom)))
+        y += layout.line_height
+    if not placed:
+        return None
+
+    x0 = min(box[0] for _, box in placed)
+    y0 = min(box[1] for _, box in placed)
+    x1 = max(box[2] for _, box in placed)
+    y1 = max(box[3] for _, box in placed)
+
+    layer = Image.new("L", (x1 - x0, y1 - y0), 0)
+    for mask, box in placed:
+        if mask.width and mask.height:
+            layer.paste(255, (box[0] - x0, box[1] - y0, box[2] - x0, box[3] - y0), mask)
+    return TextLayer(layer, (x0, y0, x1, y1))
+
+
+class LayeredCompositor:
+    """Compose cards from a cached base layer and a cached text layer.
+
+    The base (background with the watermark pasted, and an optional
+    legibility scrim) depends only on the background image and the watermark
+    at that size, so it is built once per combination. The text layer depends only on the layout and font face; changing
+    the colour reuses it, and a new layout only rasterizes the lines that
+    are not in the line mask cache yet. A card is then a flat copy of the base plus one
+    masked fill over the text rectangle, instead of an alpha composite of the
+    full watermark and a redraw of every line.
+
+    Backgrounds and watermarks are matched by identity, which is what the
+    background cache and resource registry hand out for unchanged files.
+    Bases and masks are shared and must be treated as read-only.
+
+    Bases are bounded by bytes rather than count, so every variant in use
+    for a background (scrim strengths, watermark) can stay cached at once.
+    A base only holds a weak reference to its background: it never keeps a
+    background alive, and it is dropped when the background is freed or
+    evicted from the background cache. With max_base_bytes=None the bases
+    share the background cache's budget (see BackgroundCache).
+    """
+
+    def __init__(self, max_base_bytes: Optional[int] = None, max_layers: int = 64):
+        self.max_base_bytes = max_base_bytes
+        self.max_layers = max_layers
+        self.base_bytes = 0
+        self.base_hits = 0
+        self.base_misses = 0
+        self.layer_hits = 0
+        self.layer_misses = 0
+        self._bases: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._layers: "OrderedDict[tuple, Optional[TextLayer]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _base_budget(self) -> int:
+        if self.max_base_bytes is not None:
+            return self.max_base_bytes
+        from .cache import background_cache
+
+        return background_cache.budget_bytes
+
+    def _discard_base(self, key: tuple):
+        base = self._bases.pop(key)[2]
+        self.base_bytes -= base.width * base.height * len(base.getbands())
+
+    def base(self, background: Image.Image, watermark: Optional[Image.Image] = None,
+             scrim=None) -> Image.Image:
+        """Background with the scrim and watermark applied, built once per combination.
+
+        scrim is any hashable object with an apply(image) method (see
+        contrast.Scrim); it is blended over the watermarked background, the
+        same pixels its alpha was solved against.
+        """
+        # RGBX = background dari pixel store (read-only); base selalu RGB
+        if watermark is None and scrim is None and background.mode != "RGBX":
+            return background
+
+        key = (id(background), id(watermark), scrim)
+        with self._lock:
+            entry = self._bases.get(key)
+            # id() bisa dipakai ulang setelah objek lama dibuang, jadi cek identitasnya
+            if entry is not None and entry[0]() is background and entry[1] is watermark:
+                self._bases.move_to_end(key)
+                self.base_hits += 1
+                return entry[2]
+            self.base_misses += 1
+
+        base = background.convert("RGB") if background.mode == "RGBX" else background.copy()
+        if watermark is not None:
+            base.paste(watermark, watermark)
+        if scrim is not None:
+            scrim.apply(base)
+
+        budget = self._base_budget()
+        with self._lock:
+            if key in self._bases:
+                self._discard_base(key)
+            # Base dari background yang sudah dibebaskan tidak bisa dipakai lagi
+            for dead in [k for k, entry in self._bases.items() if entry[0]() is None]:
+                self._discard_base(dead)
+            self._bases[key] = (weakref.ref(background), watermark, base)
+            self.base_bytes += base.width * base.height * len(base.getbands())
+            while self.base_bytes > budget and len(self._bases) > 1:
+                self._discard_base(next(iter(self._bases)))
+        return base
+
+    def forget(self, background: Image.Image) -> int:
+        """Drop every base built from background; returns the bytes freed"""
+        with self._lock:
+            before = self.base_bytes
+            for key in [k for k, entry in self._bases.items() if entry[0]() is background]:
+                self._discard_base(key)
+            return before - self.base_bytes
+
+    def text_layer(self, layout: TextLayout, font: ImageFont.FreeTypeFont) -> Optional[TextLayer]:
+        """Text mask for layout, rasterized once per (layout, font face)"""
+        key = (layout, font)
+        with self._lock:
+            if key in self._layers:
+                self._layers.move_to_end(key)
+                self.layer_hits += 1
+                return self._layers[key]
+            self.layer_misses += 1
+
+        layer = rasterize_text(layout, font)
+
+        with self._lock:
+            self._layers[key] = layer
+            while len(self._layers) > self.max_layers:
+                self._layers.popitem(last=False)
+        return layer
+
+    @staticmethod
+    def compose(base: Image.Image, layer: Optional[TextLayer], color: str) -> Image.Image:
+        """Copy of base with the text layer filled in color (only its rectangle is touched)"""
+        final = base.copy()
+        if layer is not None:
+            final.paste(color, layer.box, layer.mask)
+        return final
+
+    def clear(self):
+        with self._lock:
+            self._bases.clear()
+            self._layers.clear()
+            self.base_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "bases": len(self._bases),
+                "base_bytes": self.base_bytes,
+                "layers": len(self._layers),
+                "base_hits": self.base_hits,
+                "base_misses": self.base_misses,
+                "layer_hits": self.layer_hits,
+                "layer_misses": self.layer_misses,
+            }
+
+
+# Compositor bersama untuk satu proses
+compositor = LayeredCompositor()
@@ -0,0 +1,178 @@
+# image_processor/contrast.py
+"""Automatic text colour and legibility scrim from text-region luminance."""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+import threading
+import weakref
+
+import numpy as np
+from PIL import Image, ImageColor
+
+# WCAG AA untuk teks normal
+CONTRAST_TARGET = 4.5
+LIGHT_TEXT = "#FFFFFF"
+DARK_TEXT = "#000000"
+
+# Pixel paling terang/gelap (persentil) yang harus tetap terbaca
+WORST_PERCENTILES = (5, 95)
+
+# sRGB 8-bit -> linear light, sebagai lookup table
+_LINEAR = np.array(
+    [c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4 for c in np.arange(256) / 255],
+    dtype=np.float32,
+)
+_WEIGHTS = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+
+
+@dataclass(frozen=True)
+class RegionStats:
+    """Relative luminance (0..1) of the pixels behind the text"""
+    mean: float
+    low: float    # persentil gelap
+    high: float   # persentil terang
+
+
+def relative_luminance(color: str) -> float:
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return float(_LINEAR[[r, g, b]] @ _WEIGHTS)
+
+
+def contrast_ratio(l1: float, l2: float) -> float:
+    lighter, darker = max(l1, l2), min(l1, l2)
+    return (lighter + 0.05) / (darker + 0.05)
+
+
+def _to_srgb(linear: float) -> float:
+    """Inverse of the sRGB transfer curve, 0..1"""
+    if linear <= 0.0031308:
+        return linear * 12.92
+    return 1.055 * linear ** (1 / 2.4) - 0.055
+
+
+def measure_region(image: Image.Image, box: tuple[int, int, int, int]) -> RegionStats:
+    """Luminance statistics of image inside box, in one vectorized pass"""
+    region = image.crop(box)
+    if region.mode != "RGB":
+        region = region.convert("RGB")
+    pixels = np.asarray(region)
+    if pixels.size == 0:
+        return RegionStats(0.0, 0.0, 0.0)
+    luminance = _LINEAR[pixels] @ _WEIGHTS
+    low, high = np.percentile(luminance, WORST_PERCENTILES)
+    return RegionStats(float(luminance.mean()), float(low), float(high))
+
+
+def worst_contrast(color: str, stats: RegionStats) -> float:
+    """Contrast of color against the least favourable background pixels"""
+    text = relative_luminance(color)
+    return min(contrast_ratio(text, stats.low), contrast_ratio(text, stats.high))
+
+
+def choose_text_color(stats: RegionStats, candidates: tuple[str, ...] = (LIGHT_TEXT, DARK_TEXT)) -> str:
+    """Candidate with the best worst-case contrast against the region"""
+    return max(candidates, key=lambda color: worst_contrast(color, stats))
+
+
+@dataclass(frozen=True)
+class Scrim:
+    """Vertical gradient behind the text block: opaque-ish over box, fading out around it"""
+    box: tuple[int, int, int, int]
+    color: str
+    alpha: float
+    fade: int
+
+    def mask(self, width: int, height: int) -> tuple[Image.Image, int]:
+        """Alpha mask spanning the card width and the rows it covers, plus its top row"""
+        top = max(0, self.box[1] - self.fade)
+        bottom = min(height, self.box[3] + self.fade)
+        rows = np.arange(top, bottom, dtype=np.float32)
+        fade = max(1, self.fade)
+        ramp = np.minimum(
+            np.clip((rows - (self.box[1] - self.fade)) / fade, 0.0, 1.0),
+            np.clip((self.box[3] + self.fade - 1 - rows) / fade, 0.0, 1.0),
+        )
+        column = np.round(ramp * self.alpha * 255).astype(np.uint8)
+        return Image.fromarray(np.repeat(column[:, None], width, axis=1), "L"), top
+
+    def apply(self, image: Image.Image):
+        """Blend the scrim into image in place"""
+        mask, top = self.mask(image.width, image.height)
+        image.paste(self.color, (0, top, image.width, top + mask.height), mask)
+
+    def stacked(self, other: "Scrim") -> "Scrim":
+        """One scrim equal to this one with other blended on top (same colour)"""
+        alpha = 1.0 - (1.0 - self.alpha) * (1.0 - other.alpha)
+        # Minimal satu langkah 8-bit, supaya koreksi kecil tidak hilang karena pembulatan
+        return Scrim(self.box, self.color, round(min(1.0, max(alpha, self.alpha + 1 / 255)), 3), self.fade)
+
+
+def scrim_for(
+    stats: RegionStats,
+    color: str,
+    box: tuple[int, int, int, int],
+    target: float = CONTRAST_TARGET,
+) -> Optional[Scrim]:
+    """Lightest scrim that brings color up to target, or None if it already passes"""
+    if worst_contrast(color, stats) >= target:
+        return None
+
+    text = relative_luminance(color)
+    dark_scrim = contrast_ratio(text, 0.0) >= contrast_ratio(text, 1.0)
+    if dark_scrim:
+        # Pixel terang digelapkan sampai kontrasnya cukup
+        limit = max(0.0, (text + 0.05) / target - 0.05)
+        worst = _to_srgb(stats.high)
+        needed = 1.0 - _to_srgb(limit) / worst if worst > 0 else 0.0
+        scrim_color = "#000000"
+    else:
+        limit = min(1.0, target * (text + 0.05) - 0.05)
+        worst = _to_srgb(stats.low)
+        needed = (_to_srgb(limit) - worst) / (1.0 - worst) if worst < 1 else 0.0
+        scrim_color = "#FFFFFF"
+
+    alpha = float(min(1.0, max(0.0, needed)))
+    fade = max(1, (box[3] - box[1]) // 3)
+    return Scrim(box, scrim_color, round(alpha, 3), fade)
+
+
+class RegionStatsCache:
+    """Per-image luminance stats, matched by image identity like the compositor's bases.
+
+    Images are held by weak reference, so the cache never keeps a background
+    alive after the background cache or compositor has dropped it.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, image: Image.Image, box: tuple[int, int, int, int]) -> RegionStats:
+        key = (id(image), box)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is image:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        stats = measure_region(image, box)
+
+        with self._lock:
+            self._entries[key] = (weakref.ref(image), stats)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Cache bersama untuk satu proses
+region_stats = RegionStatsCache()
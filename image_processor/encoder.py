@@ -0,0 +1,252 @@
+# image_processor/encoder.py
+"""Output encoders and a background writer queue."""
+from pathlib import Path
+from dataclasses import dataclass, replace
+from typing import Callable, Optional, Union
+import io
+import os
+import queue
+import threading
+import time
+
+from PIL import Image
+
+from .metrics import metrics
+
+# Format yang mendukung alpha; selain ini RGBA harus dikonversi ke RGB
+ALPHA_FORMATS = {"PNG", "WEBP"}
+EXTENSIONS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WEBP"}
+
+
+@dataclass(frozen=True)
+class EncoderSettings:
+    """Output format and its encoder options"""
+    format: str = "PNG"
+    # PNG
+    compress_level: int = 6
+    # JPEG / WebP
+    quality: int = 90
+    progressive: bool = False
+    optimize: bool = False
+    subsampling: Optional[str] = "4:2:0"
+    # WebP
+    lossless: bool = False
+    method: int = 4
+
+    @classmethod
+    def for_path(cls, path: Union[str, Path], **overrides) -> "EncoderSettings":
+        """Pick the format from the file extension (PNG if unknown)"""
+        fmt = EXTENSIONS.get(Path(path).suffix.lower(), "PNG")
+        return cls(format=fmt, **overrides)
+
+    def for_output(self, path: Union[str, Path]) -> "EncoderSettings":
+        """These options, with the format of path's extension if it names another one.
+
+        An explicit output path wins over a forced format, so "x.png" never
+        gets JPEG bytes; paths without a known extension keep this format.
+        """
+        fmt = EXTENSIONS.get(Path(path).suffix.lower())
+        if fmt is None or fmt == self.format:
+            return self
+        return replace(self, format=fmt)
+
+    @property
+    def extension(self) -> str:
+        return {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}[self.format]
+
+    def save_options(self) -> dict:
+        if self.format == "PNG":
+            return {"compress_level": self.compress_level}
+        if self.format == "JPEG":
+            options = {"quality": self.quality, "progressive": self.progressive, "optimize": self.optimize}
+            if self.subsampling is not None:
+                options["subsampling"] = self.subsampling
+            return options
+        if self.format == "WEBP":
+            return {"quality": self.quality, "lossless": self.lossless, "method": self.method}
+        raise ValueError(f"Unsupported output format: {self.format}")
+
+
+def add_encoder_arguments(parser):
+    """Add output format options to an argparse parser"""
+    group = parser.add_argument_group("output encoding")
+    group.add_argument("--format", choices=["png", "jpeg", "webp"], default=None,
+                       help="output format (default: from output path extension)")
+    group.add_argument("--quality", type=int, default=90, help="JPEG/WebP quality")
+    group.add_argument("--compress-level", type=int, default=6, help="PNG zlib level 0-9")
+    group.add_argument("--progressive", action="store_true", help="progressive JPEG")
+    group.add_argument("--optimize", action="store_true", help="optimize JPEG Huffman tables")
+    group.add_argument("--subsampling", choices=["4:4:4", "4:2:2", "4:2:0"], default="4:2:0")
+    group.add_argument("--lossless", action="store_true", help="lossless WebP")
+
+
+def set_encoder_defaults(parser, defaults):
+    """Take the parser defaults from config's encoder section; flags still win"""
+    parser.set_defaults(
+        format=defaults.format.lower() if defaults.format else None,
+        quality=defaults.quality,
+        compress_level=defaults.compress_level,
+        progressive=defaults.progressive,
+        optimize=defaults.optimize,
+        subsampling=defaults.subsampling,
+        lossless=defaults.lossless,
+    )
+
+
+def encoder_from_args(args) -> Optional[EncoderSettings]:
+    if args.format is None:
+        return None
+    return EncoderSettings(
+        format=args.format.upper(),
+        compress_level=args.compress_level,
+        quality=args.quality,
+        progressive=args.progressive,
+        optimize=args.optimize,
+        subsampling=args.subsampling,
+        lossless=args.lossless,
+    )
+
+
+def prepare_for_format(image: Image.Image, fmt: str) -> Image.Image:
+    """Convert only when the target format cannot store the image mode"""
+    if fmt in ALPHA_FORMATS:
+        if image.mode in ("RGB", "RGBA", "L", "LA"):
+            return image
+        return image.convert("RGBA")
+    if image.mode in ("RGB", "L"):
+        return image
+    return image.convert("RGB")
+
+
+def encode(image: Image.Image, settings: EncoderSettings) -> bytes:
+    """Encode image to bytes"""
+    buffer = io.BytesIO()
+    prepare_for_format(image, settings.format).save(buffer, settings.format, **settings.save_options())
+    return buffer.getvalue()
+
+
+def write_atomic(path: Union[str, Path], data: bytes):
+    """Write data via a temp file so readers never see a partial image"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+@dataclass
+class FormatStats:
+    count: int = 0
+    encode_seconds: float = 0.0
+    write_seconds: float = 0.0
+    bytes: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "bytes": self.bytes,
+            "avg_bytes": self.bytes / self.count if self.count else 0,
+            "encode_ms": self.encode_seconds * 1000 / self.count if self.count else 0.0,
+            "write_ms": self.write_seconds * 1000 / self.count if self.count else 0.0,
+            "images_per_second": self.count / self.encode_seconds if self.encode_seconds else 0.0,
+            "megabytes_per_second": self.bytes / 1e6 / self.encode_seconds if self.encode_seconds else 0.0,
+        }
+
+
+@dataclass
+class WriteResult:
+    path: str
+    error: Optional[str] = None
+    format: Optional[str] = None
+    bytes: int = 0
+    encode_seconds: float = 0.0
+    write_seconds: float = 0.0
+    tag: object = None
+
+
+class ImageWriter:
+    """Background writer: encoding and disk I/O overlap with rendering the next card.
+
+    submit() blocks once max_pending images are waiting, which bounds the
+    memory held by finished-but-unwritten images.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 8,
+                 on_done: Optional[Callable[[WriteResult], None]] = None):
+        self.on_done = on_done
+        self.stats: dict[str, FormatStats] = {}
+        self.failed = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"image-writer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image: Image.Image, path: Union[str, Path],
+               settings: Optional[EncoderSettings] = None, tag: object = None):
+        """Queue image for encoding; the image must not be modified afterwards"""
+        self._queue.put((image, str(path), settings or EncoderSettings.for_path(path), tag))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            image, path, settings, tag = item
+            result = WriteResult(path, format=settings.format, tag=tag)
+            try:
+                start = time.perf_counter()
+                data = encode(image, settings)
+                encoded = time.perf_counter()
+                write_atomic(path, data)
+                written = time.perf_counter()
+                result.bytes = len(data)
+                result.encode_seconds = encoded - start
+                result.write_seconds = written - encoded
+                if metrics.enabled:
+                    metrics.record(f"encode_{settings.format.lower()}", result.encode_seconds)
+                    metrics.record("write", result.write_seconds)
+                with self._lock:
+                    stats = self.stats.setdefault(settings.format, FormatStats())
+                    stats.count += 1
+                    stats.bytes += result.bytes
+                    stats.encode_seconds += result.encode_seconds
+                    stats.write_seconds += result.write_seconds
+            except Exception as e:
+                result.error = str(e)
+                with self._lock:
+                    self.failed += 1
+            try:
+                if self.on_done is not None:
+                    self.on_done(result)
+            finally:
+                self._queue.task_done()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self):
+        """Wait until every queued image is written"""
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def report(self) -> dict:
+        with self._lock:
+            return {fmt: stats.as_dict() for fmt, stats in self.stats.items()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
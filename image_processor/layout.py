@@ -0,0 +1,186 @@
+# image_processor/layout.py
+"""Pixel-width text layout with memoized word metrics and auto-fit."""
+from pathlib import Path
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Union
+import threading
+
+from PIL import ImageFont
+
+from .resources import resources
+
+MAX_CACHED_WORDS = 50_000   # Per (font, size); dikosongkan kalau lewat batas
+
+
+@dataclass(frozen=True)
+class TextLayout:
+    """Wrapped lines and their placement on the card"""
+    lines: tuple[str, ...]
+    font_size: int
+    line_height: int
+    x: int
+    y: int
+
+    @property
+    def height(self) -> int:
+        return len(self.lines) * self.line_height
+
+    def scaled(self, scale: float) -> "TextLayout":
+        """Same lines, positions and sizes multiplied by scale (for proxy previews)"""
+        if scale == 1.0:
+            return self
+        return replace(
+            self,
+            font_size=max(1, round(self.font_size * scale)),
+            line_height=max(1, round(self.line_height * scale)),
+            x=round(self.x * scale),
+            y=round(self.y * scale),
+        )
+
+
+class GlyphMetrics:
+    """Memoized advances for one FreeType face at one size"""
+
+    def __init__(self, font: ImageFont.FreeTypeFont):
+        self.font = font
+        self.space = font.getlength(" ")
+        self._words: dict[str, float] = {}
+
+    def width(self, word: str) -> float:
+        width = self._words.get(word)
+        if width is None:
+            if len(self._words) >= MAX_CACHED_WORDS:
+                self._words.clear()
+            width = self._words[word] = self.font.getlength(word)
+        return width
+
+
+_metrics: dict[tuple, GlyphMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def metrics_for(font_path: Union[str, Path], size: int) -> GlyphMetrics:
+    """Shared GlyphMetrics for (font, size); follows font reloads in the registry"""
+    font = resources.font(font_path, size)
+    key = (str(font_path), size)
+    with _metrics_lock:
+        metrics = _metrics.get(key)
+        if metrics is None or metrics.font is not font:
+            metrics = _metrics[key] = GlyphMetrics(font)
+        return metrics
+
+
+def _break_word(word: str, metrics: GlyphMetrics, max_width: float) -> list[str]:
+    """Split a single word that is wider than the box"""
+    pieces = []
+    current = ""
+    for char in word:
+        if current and metrics.width(current + char) > max_width:
+            pieces.append(current)
+            current = char
+        else:
+            current += char
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def wrap_text(text: str, metrics: GlyphMetrics, max_width: float) -> list[str]:
+    """Greedy wrap by measured pixel width"""
+    lines = []
+    current: list[str] = []
+    current_width = 0.0
+
+    for word in text.split():
+        width = metrics.width(word)
+        if width > max_width:
+            if current:
+                lines.append(" ".join(current))
+            *full, last = _break_word(word, metrics, max_width)
+            lines.extend(full)
+            current, current_width = [last], metrics.width(last)
+            continue
+
+        if current and current_width + metrics.space + width > max_width:
+            lines.append(" ".join(current))
+            current, current_width = [word], width
+        elif current:
+            current.append(word)
+            current_width += metrics.space + width
+        else:
+            current, current_width = [word], width
+
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+def _line_height(size: int, line_spacing: float) -> int:
+    return max(1, round(size * line_spacing))
+
+
+@lru_cache(maxsize=2048)
+def _fit_cached(
+    text: str,
+    font_path: str,
+    font_stamp: tuple,
+    max_size: int,
+    min_size: int,
+    box: tuple[int, int, int, int],
+    line_spacing: float,
+    auto_fit: bool,
+) -> TextLayout:
+    x, y, width, height = box
+
+    def attempt(size: int) -> tuple[list[str], int]:
+        lines = wrap_text(text, metrics_for(font_path, size), width)
+        return lines, _line_height(size, line_spacing)
+
+    lines, line_height = attempt(max_size)
+    size = max_size
+    if auto_fit and len(lines) * line_height > height and min_size < max_size:
+        # Binary search ukuran terbesar yang masih muat di box
+        low, high = min_size, max_size - 1
+        best = (min_size, *attempt(min_size))
+        while low <= high:
+            mid = (low + high) // 2
+            mid_lines, mid_height = attempt(mid)
+            if len(mid_lines) * mid_height <= height:
+                best = (mid, mid_lines, mid_height)
+                low = mid + 1
+            else:
+                high = mid - 1
+        size, lines, line_height = best
+
+    return TextLayout(tuple(lines), size, line_height, x, y)
+
+
+def fit_text(
+    text: str,
+    font_path: Union[str, Path],
+    max_size: int,
+    box: tuple[int, int, int, int],
+    *,
+    min_size: int,
+    line_spacing: float,
+    auto_fit: bool = True,
+) -> TextLayout:
+    """Wrap text to the box width, shrinking the font (down to min_size) until it fits.
+
+    box is (x, y, width, height) in card pixels. Results are memoized per text
+    and parameters, and word widths per (font, size), so re-layout while
+    typing only measures new words.
+    """
+    path = Path(font_path)
+    stat = path.stat()
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    return _fit_cached(" ".join(text.split()), str(path), stamp, max_size, min_size,
+                       tuple(box), line_spacing, auto_fit)
+
+
+def clear_caches():
+    """Drop memoized layouts and word metrics (dipakai benchmark untuk run dingin)"""
+    _fit_cached.cache_clear()
+    with _metrics_lock:
+        _metrics.clear()
@@ -0,0 +1,181 @@
+# image_processor/metrics.py
+"""Per-stage render timing with pluggable sinks.
+
+Instrumentation is off by default; while disabled, stage() hands back a
+shared no-op context manager so the hooks cost a single attribute check.
+"""
+from pathlib import Path
+from contextlib import nullcontext
+from typing import Callable, Optional, Union
+import os
+import threading
+import time
+
+# logging/json baru di-import saat dipakai, supaya start-up tetap ringan
+LOGGER_NAME = "quote_generator.metrics"
+
+_NULL_CONTEXT = nullcontext()
+
+
+class StageStats:
+    __slots__ = ("count", "total", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "avg_ms": self.total * 1000 / self.count if self.count else 0.0,
+            "max_ms": self.max * 1000,
+            "last_ms": self.last * 1000,
+        }
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Stage timings and gauges, forwarded to any number of sinks"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sinks: list = []
+        self._stages: dict[str, StageStats] = {}
+        self._gauges: dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str):
+        """Context manager timing one pipeline stage"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _StageTimer(self, name)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = StageStats()
+            stats.add(seconds)
+        for sink in self.sinks:
+            try:
+                sink.record(name, seconds)
+            except Exception:
+                import logging
+                logging.getLogger(LOGGER_NAME).exception("metrics sink %r failed", sink)
+
+    def register_gauge(self, name: str, read: Callable[[], float]):
+        """Gauge read lazily at snapshot time (cache hit rates, queue depths)"""
+        with self._lock:
+            self._gauges[name] = read
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {name: stats.as_dict() for name, stats in self._stages.items()}
+            gauges = dict(self._gauges)
+        values = {}
+        for name, read in gauges.items():
+            try:
+                values[name] = float(read())
+            except Exception:
+                continue
+        return {"stages": stages, "gauges": values}
+
+    def configure(self, enabled: bool, sinks: Optional[list] = None):
+        self.enabled = enabled
+        if sinks is not None:
+            for sink in self.sinks:
+                if hasattr(sink, "close"):
+                    sink.close()
+            self.sinks = list(sinks)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+class LogSink:
+    """One JSON line per stage through the logging module"""
+
+    def __init__(self, log=None, level: Optional[int] = None):
+        import logging
+
+        self.log = log or logging.getLogger(LOGGER_NAME)
+        self.level = logging.INFO if level is None else level
+
+    def record(self, name: str, seconds: float):
+        import json
+
+        self.log.log(self.level, json.dumps({"event": "stage", "stage": name, "ms": round(seconds * 1000, 3)}))
+
+
+def prometheus_text(snapshot: dict, prefix: str = "quote") -> str:
+    """Render a snapshot in the Prometheus text exposition format"""
+    lines = [
+        f"# HELP {prefix}_stage_seconds Time spent per render stage.",
+        f"# TYPE {prefix}_stage_seconds summary",
+    ]
+    for name, stats in sorted(snapshot["stages"].items()):
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stats["total_ms"] / 1000:.6f}')
+    lines.append(f"# HELP {prefix}_stage_seconds_max Slowest observation per render stage.")
+    lines.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+    for name, stats in sorted(snapshot["stages"].items()):
+        lines.append(f'{prefix}_stage_seconds_max{{stage="{name}"}} {stats["max_ms"] / 1000:.6f}')
+    for name, value in sorted(snapshot["gauges"].items()):
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        lines.append(f"{prefix}_{name} {value:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusFileSink:
+    """Periodically rewrite a .prom file (node_exporter textfile collector style)"""
+
+    def __init__(self, metrics: Metrics, path: Union[str, Path], interval: float = 5.0):
+        self.metrics = metrics
+        self.path = Path(path)
+        self.interval = interval
+        self._last_write = 0.0
+
+    def record(self, name: str, seconds: float):
+        now = time.monotonic()
+        if now - self._last_write >= self.interval:
+            self._last_write = now
+            self.flush()
+
+    def flush(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        tmp_path.write_text(prometheus_text(self.metrics.snapshot()), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        self.flush()
+
+
+# Registry bersama untuk satu proses
+metrics = Metrics()
@@ -0,0 +1,169 @@
+# image_processor/processor.py
+"""Render core shared by the GUIs: one background, one quote, preview and save."""
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Optional, Union
+import threading
+
+from PIL import Image
+
+from .cache import background_cache
+from .encoder import EncoderSettings, encode, write_atomic
+from .metrics import metrics
+from .renderer import FONT_PATH, FONT_SIZE, PREVIEW_SIZE, X_START, compose_quote, render_preview
+
+
+@dataclass(frozen=True)
+class Card:
+    """Everything that determines a rendered card (hashable, safe to pass to workers)"""
+    background: Optional[Path] = None
+    text: str = ""
+    color: str = "#FFFFFF"
+    scrim: bool = False
+    font_size: int = FONT_SIZE
+    font_path: Path = FONT_PATH
+    x_start: int = X_START
+
+
+class ImageProcessor:
+    """Holds the card being edited and renders it for preview and save.
+
+    Preview and save go through the same compose_quote call (same x_start,
+    font and layout), at proxy and full resolution respectively, so what is
+    previewed is what gets written. The last full-resolution composite is
+    kept together with its Card: saving an unchanged card, saving it again,
+    or saving all sizes reuses it instead of rendering again. prefetch()
+    builds it in the background after a preview so Save is immediate.
+
+    Methods that take a card use the current one when card is None; GUIs
+    that render on a worker thread should snapshot card() on the Tk thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        font_size: int = FONT_SIZE,
+        font_path: Union[str, Path] = FONT_PATH,
+        preview_size: tuple[int, int] = PREVIEW_SIZE,
+    ):
+        self.preview_size = preview_size
+        self._card = Card(font_size=font_size, font_path=Path(font_path))
+        self._full: Optional[tuple[tuple, Image.Image]] = None
+        self._full_lock = threading.Lock()
+        self._wanted: Optional[Card] = None
+        # Satu thread saja: prefetch tidak boleh bersaing dengan preview worker
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="full-prefetch")
+
+    def card(self) -> Card:
+        return self._card
+
+    def configure(self, *, font_size: Optional[int] = None, font_path: Union[str, Path, None] = None,
+                  preview_size: Optional[tuple[int, int]] = None):
+        """Apply new render settings (config reload)"""
+        if preview_size is not None:
+            self.preview_size = preview_size
+        changes = {}
+        if font_size is not None:
+            changes["font_size"] = font_size
+        if font_path is not None:
+            changes["font_path"] = Path(font_path)
+        self._card = replace(self._card, **changes)
+
+    def load_background(self, path: Union[str, Path]) -> Image.Image:
+        """Select a background; returns its preview-resolution proxy.
+
+        Raises whatever decoding raises, leaving the previous background selected.
+        """
+        path = Path(path).resolve()
+        proxy = background_cache.get(path, max_size=self.preview_size)
+        self._card = replace(self._card, background=path)
+        return proxy
+
+    def add_text(self, text: str, color: str = "#FFFFFF", scrim: bool = False):
+        """Set the quote text and how it is drawn"""
+        self._card = replace(self._card, text=text.strip(), color=color, scrim=scrim)
+
+    def clear(self):
+        self._card = replace(self._card, background=None, text="")
+        self._wanted = None
+        with self._full_lock:
+            self._full = None
+
+    @staticmethod
+    def _check(card: Card, need_text: bool = True):
+        if card.background is None:
+            raise ValueError("Please select a background image first")
+        if need_text and not card.text:
+            raise ValueError("Please enter some text for the quote")
+
+    def get_preview(self, card: Optional[Card] = None) -> Image.Image:
+        """Render card at preview resolution (without text: background and watermark only)"""
+        card = card or self._card
+        self._check(card, need_text=False)
+        return render_preview(
+            card.background,
+            card.text,
+            card.color,
+            max_size=self.preview_size,
+            font_size=card.font_size,
+            x_start=card.x_start,
+            scrim=card.scrim,
+            font_path=card.font_path,
+        )
+
+    @staticmethod
+    def _full_key(card: Card) -> tuple:
+        # File background yang berubah di disk juga membatalkan hasil lama
+        stat = card.background.stat()
+        return (card, stat.st_mtime_ns, stat.st_size)
+
+    def get_image(self, card: Optional[Card] = None) -> Image.Image:
+        """The full-resolution card, composed only if it changed since the last call.
+
+        The returned image is shared and must not be modified.
+        """
+        card = card or self._card
+        self._check(card)
+        key = self._full_key(card)
+        # Lock dipegang selama compose: Save menunggu prefetch yang sedang jalan lalu memakai hasilnya
+        with self._full_lock:
+            if self._full is not None and self._full[0] == key:
+                return self._full[1]
+            with metrics.stage("save_compose"):
+                image = compose_quote(
+                    background_cache.get(card.background),
+                    card.text,
+                    card.color,
+                    font_size=card.font_size,
+                    x_start=card.x_start,
+                    scrim=card.scrim,
+                    font_path=card.font_path,
+                )
+            self._full = (key, image)
+            return image
+
+    def prefetch(self, card: Optional[Card] = None):
+        """Compose the full-resolution card in the background (newest request wins)"""
+        card = card or self._card
+        self._wanted = card
+
+        def run():
+            if self._wanted != card:
+                return  # Sudah ada perubahan yang lebih baru
+            try:
+                self.get_image(card)
+            except Exception:
+                pass  # Save akan melaporkan error-nya sendiri
+
+        self._prefetcher.submit(run)
+
+    def save_image(self, path: Union[str, Path], settings: Optional[EncoderSettings] = None,
+                   card: Optional[Card] = None) -> str:
+        """Encode and write the card synchronously; returns the path written"""
+        image = self.get_image(card)
+        write_atomic(path, encode(image, settings or EncoderSettings.for_path(path)))
+        return str(path)
+
+    def close(self):
+        self._prefetcher.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,170 @@
+# image_processor/render_cache.py
+"""Content-addressed on-disk cache of finished cards."""
+from pathlib import Path
+from typing import Union
+import hashlib
+import os
+import shutil
+import threading
+
+RENDER_CACHE_DIRNAME = ".render_cache"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Naikkan kalau hasil render berubah untuk input yang sama (mis. algoritma layout)
+RENDER_VERSION = 4  # v4: background selalu RGB di ukuran kartu (v3: scrim di atas watermark)
+
+_digests: dict[tuple, str] = {}
+_digests_lock = threading.Lock()
+_MAX_DIGESTS = 4096  # Proses yang hidup lama (watch, server) tidak boleh tumbuh tanpa batas
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """SHA-256 of a file's content, memoized per (path, mtime, size)"""
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        with _digests_lock:
+            if len(_digests) >= _MAX_DIGESTS:
+                _digests.clear()
+            _digests[key] = digest
+    return digest
+
+
+def render_key(**params) -> str:
+    """Stable key for one output file from everything that affects its bytes.
+
+    Values must have a deterministic repr (str, numbers, tuples, frozen
+    dataclasses); files should be passed as their file_digest().
+    """
+    raw = "\n".join(f"{name}={params[name]!r}" for name in sorted(params))
+    return hashlib.sha256(f"v{RENDER_VERSION}\n{raw}".encode("utf-8")).hexdigest()
+
+
+def _copy_atomic(source: Path, target: Path):
+    """Atomically replace target with a copy of source"""
+    # Sengaja bukan hard link: tool yang mengedit output di tempat (optimizer, r+b)
+    # akan ikut mengubah isi cache, dan setiap hit berikutnya menyajikan file itu
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+class RenderCache:
+    """Finished output files stored under the hash of their render inputs.
+
+    Files live at <cache_dir>/<key[:2]>/<key><ext>; outputs and cache entries
+    are always separate copies, so editing an output never changes what a
+    later hit serves. Writes go through a temp
+    file and os.replace, so concurrent workers producing the same key never
+    expose a partial file (identical keys mean identical bytes, so the last
+    writer winning is harmless). A hit touches the entry's mtime; trim()
+    evicts the least recently used entries once the directory exceeds
+    max_bytes. Statistics are per process.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._added_bytes = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Dikirim ke worker proses: lock dan statistik tidak ikut
+        return {"cache_dir": self.cache_dir, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["cache_dir"], state["max_bytes"])
+
+    def path_for(self, key: str, extension: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{extension}"
+
+    def fetch(self, key: str, extension: str, output_path: Union[str, Path]) -> bool:
+        """Place the cached file for key at output_path; False on a miss"""
+        cached = self.path_for(key, extension)
+        output_path = Path(output_path)
+        try:
+            _copy_atomic(cached, output_path)
+            os.utime(cached)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key: str, extension: str, output_path: Union[str, Path]):
+        """Keep a just-written output file under key (best effort)"""
+        cached = self.path_for(key, extension)
+        try:
+            _copy_atomic(Path(output_path), cached)
+            size = cached.stat().st_size
+        except OSError:
+            return
+        with self._lock:
+            self.stores += 1
+            self._added_bytes += size
+            over_budget = self._added_bytes > self.max_bytes // 10
+        if over_budget:
+            self.trim()
+
+    def trim(self) -> int:
+        """Evict least recently used entries until under max_bytes; returns bytes freed"""
+        with self._lock:
+            self._added_bytes = 0
+        entries = []
+        total = 0
+        try:
+            shards = list(os.scandir(self.cache_dir))
+        except OSError:
+            return 0
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            with os.scandir(shard.path) as it:
+                for item in it:
+                    if item.name.endswith(".tmp") or not item.is_file():
+                        continue
+                    stat = item.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, item.path))
+                    total += stat.st_size
+
+        freed = 0
+        if total > self.max_bytes:
+            # Turun sampai 90% supaya tidak trim lagi di setiap store
+            goal = total - int(self.max_bytes * 0.9)
+            for _, size, path in sorted(entries):
+                if freed >= goal:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                freed += size
+                with self._lock:
+                    self.evictions += 1
+        return freed
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,517 @@
+# image_processor/renderer.py
+"""Tk-free quote card renderer and parallel batch engine."""
+from pathlib import Path
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, Optional, Union
+import math
+import os
+import time
+
+from PIL import Image, ImageFont
+
+from .background_store import CARD_SIZE, RAW_MODE, cover_box, mapped_background
+from .compositor import compositor
+from .encoder import EncoderSettings, ImageWriter, WriteResult
+from .layout import TextLayout, fit_text
+from .metrics import metrics
+from .render_cache import RenderCache, file_digest, render_key
+from .renditions import Rendition, derive_renditions
+from .resources import resources
+
+WATERMARK_PATH = Path("resource/Img-3.png")
+FONT_PATH = Path("resource/PlusJakartaSans-SemiBold.ttf")
+
+# Posisi statis teks (sama dengan GUI)
+X_START = 100
+Y_START = 990
+LINE_HEIGHT = 51
+MAX_CHARS = 48
+FONT_SIZE = 40
+
+# Area teks untuk wrapping berdasarkan lebar pixel dan auto-fit
+TEXT_BOX_WIDTH = 1000
+TEXT_BOX_HEIGHT = 270  # Sampai batas bawah panel gelap watermark (y=1260)
+MIN_FONT_SIZE = 24
+LINE_SPACING = LINE_HEIGHT / FONT_SIZE
+
+# Ukuran maksimal area preview di GUI
+PREVIEW_SIZE = (800, 600)
+
+# Warna teks dipilih otomatis dari luminance area teks (lihat contrast.py)
+AUTO_COLOR = "auto"
+SCRIM_PASSES = 4  # Scrim dicek ulang dan ditebalkan sampai kotak teks mencapai target kontras
+
+
+@dataclass
+class RenderJob:
+    """One quote card to render"""
+    text: str
+    background: str
+    color: str = "#FFFFFF"
+    output_path: Optional[str] = None
+
+
+@dataclass
+class RenderResult:
+    """Outcome of a single render job"""
+    index: int
+    output_path: Optional[str]
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    format: Optional[str] = None
+    bytes: int = 0
+    encode_seconds: float = 0.0
+    outputs: list[WriteResult] = field(default_factory=list)  # Satu per file (rendition)
+    cached: bool = False  # Semua file diambil dari render cache
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def summarize_encoding(results: Iterable[RenderResult]) -> dict:
+    """Per-format encode throughput for a finished batch"""
+    summary: dict[str, dict] = {}
+    for result in results:
+        if result is None or not result.ok or result.cached:
+            continue  # Hasil dari render cache tidak di-encode
+        for output in result.outputs:
+            entry = summary.setdefault(output.format, {"count": 0, "bytes": 0, "encode_seconds": 0.0})
+            entry["count"] += 1
+            entry["bytes"] += output.bytes
+            entry["encode_seconds"] += output.encode_seconds
+    for entry in summary.values():
+        seconds = entry["encode_seconds"]
+        entry["avg_bytes"] = entry["bytes"] / entry["count"]
+        entry["encode_ms"] = seconds * 1000 / entry["count"]
+        entry["images_per_second"] = entry["count"] / seconds if seconds else 0.0
+    return summary
+
+
+def split_text_into_lines(text: str, max_chars: int = MAX_CHARS) -> list[str]:
+    """Split text into lines with a maximum character limit per line."""
+    words = text.split()
+    lines = []
+    current_line = ""
+
+    for word in words:
+        # Jika menambahkan kata berikutnya melebihi batas karakter
+        if len(current_line) + len(word) + 1 > max_chars:
+            lines.append(current_line.strip())  # Simpan baris saat ini
+            current_line = word  # Mulai baris baru dengan kata saat ini
+        else:
+            if current_line:
+                current_line += " " + word
+            else:
+                current_line = word
+
+    # Tambahkan baris terakhir jika ada
+    if current_line:
+        lines.append(current_line.strip())
+
+    return lines
+
+
+def load_watermark(
+    path: Union[str, Path] = WATERMARK_PATH,
+    size: Optional[tuple[int, int]] = None,
+) -> Image.Image:
+    """Return the shared RGBA watermark (read-only), optionally resized"""
+    return resources.watermark(path, size)
+
+
+def load_font(size: int = FONT_SIZE, path: Union[str, Path] = FONT_PATH) -> ImageFont.FreeTypeFont:
+    """Return the shared quote font"""
+    return resources.font(path, size)
+
+
+def _card_target(max_size: Optional[tuple[int, int]]) -> tuple[int, int]:
+    if max_size is None:
+        return CARD_SIZE
+    ratio = min(max_size[0] / CARD_SIZE[0], max_size[1] / CARD_SIZE[1], 1.0)
+    return max(1, round(CARD_SIZE[0] * ratio)), max(1, round(CARD_SIZE[1] * ratio))
+
+
+def decode_background(path: Union[str, Path], max_size: Optional[tuple[int, int]] = None) -> Image.Image:
+    """Decode a background file at the card size, never using the pixel store"""
+    target = _card_target(max_size)
+    image = Image.open(path)
+    if max_size is not None:
+        # JPEG: decode langsung di skala 1/2, 1/4 atau 1/8 yang masih >= target
+        image.draft("RGB", target)
+    image.load()
+    # Selalu RGB, sama dengan pixel store (background_store.normalize): alpha PNG dibuang
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if image.size != target:
+        resample = Image.Resampling.LANCZOS if max_size is None else Image.Resampling.BILINEAR
+        image = image.resize(target, resample, box=cover_box(image.size, target),
+                             reducing_gap=3.0 if max_size is None else 2.0)
+    image.info["scale"] = target[0] / CARD_SIZE[0]
+    return image
+
+
+def open_background(path: Union[str, Path], max_size: Optional[tuple[int, int]] = None) -> Image.Image:
+    """Open a background at the card size (CARD_SIZE).
+
+    Backgrounds with an up-to-date entry in the pixel store (see
+    background_store) are memory-mapped instead of decoded; the full-size
+    image is then shared and read-only. Other files are decoded and, if
+    their size differs from the card, center-cropped to its aspect ratio and
+    resized, the same normalization the store applies. Both paths return
+    the same mode: RGBX at full size (the store's zero-copy layout) and RGB
+    for proxies; the alpha channel of a transparent background is dropped.
+
+    With max_size the card is fit inside max_size (JPEG draft decode when
+    not stored); the factor relative to the full card is stored in
+    image.info["scale"].
+    """
+    target = _card_target(max_size)
+    mapped = mapped_background(path)
+    if mapped is not None and max_size is None:
+        image = mapped
+    elif mapped is not None:
+        with metrics.stage("decode_proxy"):
+            # reduce() eksplisit (box filter bilangan bulat) lalu resize kecil: lebih cepat dari reducing_gap
+            factor = max(1, min(CARD_SIZE[0] // target[0], CARD_SIZE[1] // target[1]))
+            image = (mapped.reduce(factor) if factor > 1 else mapped).convert("RGB")
+            if image.size != target:
+                image = image.resize(target, Image.Resampling.BILINEAR)
+    else:
+        with metrics.stage("decode" if max_size is None else "decode_proxy"):
+            image = decode_background(path, max_size)
+            if max_size is None:
+                image = image.convert(RAW_MODE)
+    image.info["scale"] = target[0] / CARD_SIZE[0]
+    return image
+
+
+def layout_quote(
+    text: str,
+    font_size: int = FONT_SIZE,
+    x_start: int = X_START,
+    auto_fit: bool = True,
+    font_path: Union[str, Path] = FONT_PATH,
+) -> TextLayout:
+    """Lay out quote text in the card's text box at full resolution"""
+    return fit_text(
+        text,
+        font_path,
+        font_size,
+        (x_start, Y_START, TEXT_BOX_WIDTH, TEXT_BOX_HEIGHT),
+        min_size=min(MIN_FONT_SIZE, font_size),
+        line_spacing=LINE_SPACING,
+        auto_fit=auto_fit,
+    )
+
+
+def text_box(x_start: int = X_START, scale: float = 1.0,
+             size: Optional[tuple[int, int]] = None) -> tuple[int, int, int, int]:
+    """The card's text box as (left, top, right, bottom), scaled and clipped to size"""
+    left, top = round(x_start * scale), round(Y_START * scale)
+    right, bottom = round((x_start + TEXT_BOX_WIDTH) * scale), round((Y_START + TEXT_BOX_HEIGHT) * scale)
+    if size is not None:
+        right, bottom = min(right, size[0]), min(bottom, size[1])
+    return (left, top, max(left, right), max(top, bottom))
+
+
+def compose_quote(
+    background: Image.Image,
+    text: str,
+    color: str = "#FFFFFF",
+    *,
+    watermark: Optional[Image.Image] = None,
+    font_size: int = FONT_SIZE,
+    x_start: int = X_START,
+    layout: Optional[TextLayout] = None,
+    scale: float = 1.0,
+    scrim: bool = False,
+    font_path: Union[str, Path] = FONT_PATH,
+) -> Image.Image:
+    """Composite watermark and wrapped quote text onto a copy of the background.
+
+    Layout is always computed at full resolution; with scale != 1 the
+    watermark, font size and positions are scaled to match a proxy background.
+    The background+watermark base and the text mask are cached by the shared
+    compositor, so repeated renders only pay for what changed.
+
+    color=AUTO_COLOR picks white or black text from the luminance of the text
+    box; scrim=True darkens (or lightens) the text box with a gradient when
+    the colour would still miss the contrast target.
+    """
+    with metrics.stage("watermark_paste"):
+        if watermark is None and WATERMARK_PATH.exists():
+            watermark = load_watermark()
+            if scale != 1.0:
+                size = (max(1, round(watermark.width * scale)), max(1, round(watermark.height * scale)))
+                watermark = load_watermark(size=size)
+        base = compositor.base(background, watermark)
+
+    if color == AUTO_COLOR or scrim:
+        with metrics.stage("contrast"):
+            # Import di sini supaya numpy hanya dibutuhkan kalau fitur ini dipakai
+            from .contrast import choose_text_color, region_stats, scrim_for
+
+            box = text_box(x_start, scale, base.size)
+            stats = region_stats.get(base, box)
+            if color == AUTO_COLOR:
+                color = choose_text_color(stats)
+            if scrim:
+                overlay = scrim_for(stats, color, box)
+                # Ukur hasilnya: pixel berwarna dan pembulatan alpha bisa membuat target sedikit meleset
+                passes = 0
+                while overlay is not None:
+                    base = compositor.base(background, watermark, overlay)
+                    passes += 1
+                    residual = scrim_for(region_stats.get(base, box), color, box)
+                    if residual is None or residual.color != overlay.color or overlay.alpha >= 1.0 \
+                            or passes == SCRIM_PASSES:
+                        break
+                    overlay = overlay.stacked(residual)
+
+    with metrics.stage("layout"):
+        if layout is None:
+            layout = layout_quote(text, font_size, x_start, font_path=font_path)
+        layout = layout.scaled(scale)
+        font = load_font(layout.font_size, font_path)
+
+    with metrics.stage("text_draw"):
+        layer = compositor.text_layer(layout, font)
+
+    with metrics.stage("copy"):
+        return compositor.compose(base, layer, color)
+
+
+def render_preview(
+    background_path: Union[str, Path],
+    text: str,
+    color: str = "#FFFFFF",
+    *,
+    max_size: tuple[int, int] = PREVIEW_SIZE,
+    font_size: int = FONT_SIZE,
+    x_start: int = X_START,
+    scrim: bool = False,
+    font_path: Union[str, Path] = FONT_PATH,
+) -> Image.Image:
+    """Render a reduced-resolution preview that matches the full-size output.
+
+    The background is decoded at proxy scale and the watermark, font size and
+    text positions are scaled by the same factor, so only preview-sized pixels
+    are decoded, pasted and rasterized.
+    """
+    from .cache import background_cache
+
+    base = background_cache.get(background_path, max_size=max_size)
+    return compose_quote(
+        base,
+        text,
+        color,
+        font_size=font_size,
+        x_start=x_start,
+        scale=base.info.get("scale", 1.0),
+        scrim=scrim,
+        font_path=font_path,
+    )
+
+
+def _default_output_path(output_dir: Path, index: int, extension: str = ".png") -> str:
+    return str(output_dir / f"quote_{index:05d}{extension}")
+
+
+def _render_inputs(background: str, font_size: int, scrim: bool, font_path: Union[str, Path]) -> dict:
+    """Render-cache key parts shared by every job on one background"""
+    return {
+        "background": file_digest(background),
+        "font": file_digest(font_path),
+        "watermark": file_digest(WATERMARK_PATH) if WATERMARK_PATH.exists() else None,
+        "font_size": font_size,
+        "scrim": scrim,
+        "layout": (X_START, Y_START, TEXT_BOX_WIDTH, TEXT_BOX_HEIGHT, MIN_FONT_SIZE, LINE_SPACING),
+    }
+
+
+def _render_group(
+    background: str,
+    items: list[tuple[int, str, str, str]],
+    font_size: int,
+    encoder: Optional[EncoderSettings] = None,
+    scrim: bool = False,
+    renditions: Optional[list[Rendition]] = None,
+    cache: Optional[RenderCache] = None,
+    font_path: Union[str, Path] = FONT_PATH,
+) -> list[RenderResult]:
+    """Worker: decode one background once and render every job that uses it.
+
+    With a render cache, outputs whose inputs are unchanged are copied from
+    the cache and the background is only decoded if some job misses.
+    """
+    from .cache import background_cache
+
+    results = []
+    watermark = load_watermark() if WATERMARK_PATH.exists() else None
+
+    inputs = None
+    if cache is not None:
+        try:
+            inputs = _render_inputs(background, font_size, scrim, font_path)
+        except OSError:
+            cache = None
+
+    base = None
+    base_error = None
+
+    def on_written(written):
+        # Dengan renditions satu job menghasilkan beberapa file; dijumlahkan di sini
+        result, key = written.tag
+        if key is not None and written.error is None:
+            cache.store(key, Path(written.path).suffix, written.path)
+        result.outputs.append(replace(written, tag=None))
+        result.error = result.error or written.error
+        result.format = written.format if result.format in (None, written.format) else "mixed"
+        result.bytes += written.bytes
+        result.encode_seconds += written.encode_seconds
+        result.elapsed += written.encode_seconds + written.write_seconds
+
+    # Encode + tulis ke disk di thread lain sementara kartu berikutnya dirender
+    with ImageWriter(workers=1, max_pending=2 * max(1, len(renditions or ())), on_done=on_written) as writer:
+        for index, text, color, output_path in items:
+            start = time.perf_counter()
+            result = RenderResult(index, output_path)
+            results.append(result)
+            try:
+                settings = encoder.for_output(output_path) if encoder else EncoderSettings.for_path(output_path)
+                if renditions:
+                    planned = [
+                        (rendition, rendition.output_path(output_path, settings), rendition.encoder or settings)
+                        for rendition in renditions
+                    ]
+                else:
+                    planned = [(None, output_path, settings)]
+
+                keys = {}
+                if cache is not None:
+                    for rendition, path, path_settings in planned:
+                        key = render_key(**inputs, text=" ".join(text.split()), color=color,
+                                         encoder=path_settings, rendition=rendition)
+                        if not cache.fetch(key, Path(path).suffix, path):
+                            keys[path] = key
+                        else:
+                            # File dari cache tetap dilaporkan (manifest shard butuh semua path)
+                            result.outputs.append(WriteResult(path, format=path_settings.format,
+                                                              bytes=os.path.getsize(path)))
+                    planned = [entry for entry in planned if entry[1] in keys]
+                    if not planned:
+                        result.cached = True
+                        result.elapsed = time.perf_counter() - start
+                        continue
+
+                if base is None and base_error is None:
+                    try:
+                        # Worker proses dipakai ulang, jadi chunk berikutnya bisa kena cache
+                        base = background_cache.get(background)
+                    except Exception as e:
+                        base_error = f"Background error: {e}"
+                if base_error is not None:
+                    raise RuntimeError(base_error)
+
+                final = compose_quote(base, text, color, watermark=watermark, font_size=font_size,
+                                      scrim=scrim, font_path=font_path)
+                if renditions:
+                    images = derive_renditions(final, [rendition for rendition, _, _ in planned])
+                    outputs = [(image, path, path_settings)
+                               for (_, image), (_, path, path_settings) in zip(images, planned)]
+                else:
+                    outputs = [(final, output_path, settings)]
+                result.elapsed = time.perf_counter() - start
+                for image, path, image_settings in outputs:
+                    writer.submit(image, path, image_settings, tag=(result, keys.get(path)))
+            except Exception as e:
+                result.error = str(e)
+                result.elapsed = time.perf_counter() - start
+
+    return results
+
+
+def group_jobs(
+    jobs: list[RenderJob],
+    output_dir: Path,
+    chunk_size: int,
+    extension: str = ".png",
+) -> list[tuple[str, list]]:
+    """Group jobs by background, splitting big groups so every worker gets work"""
+    groups: dict[str, list] = {}
+    for index, job in enumerate(jobs):
+        output_path = job.output_path or _default_output_path(output_dir, index, extension)
+        key = str(Path(job.background).resolve())
+        groups.setdefault(key, []).append((index, job.text, job.color, output_path))
+
+    tasks = []
+    for background, items in groups.items():
+        for i in range(0, len(items), chunk_size):
+            tasks.append((background, items[i:i + chunk_size]))
+    return tasks
+
+
+def render_batch(
+    jobs: Iterable[RenderJob],
+    output_dir: Union[str, Path] = "Quotes",
+    workers: Optional[int] = None,
+    font_size: int = FONT_SIZE,
+    encoder: Optional[EncoderSettings] = None,
+    scrim: bool = False,
+    renditions: Optional[list[Rendition]] = None,
+    cache: Optional[RenderCache] = None,
+    font_path: Union[str, Path] = FONT_PATH,
+) -> list[RenderResult]:
+    """Render jobs across a process pool; one failed job never aborts the batch.
+
+    encoder sets the output format for every job; without it the format
+    follows each output path's extension (PNG by default). Jobs may use
+    color="auto"; the text-box statistics are computed once per background.
+    With renditions (see renditions.PRESETS) each card is composed once and
+    every rendition is derived from it and written as <output>_<name>.<ext>.
+    With a render cache, unchanged jobs are restored from it without
+    rendering (result.cached).
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+
+    workers = workers or os.cpu_count() or 1
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Beberapa chunk per worker supaya beban tetap seimbang
+    chunk_size = max(1, math.ceil(len(jobs) / (workers * 4)))
+    tasks = group_jobs(jobs, output_dir, chunk_size, encoder.extension if encoder else ".png")
+
+    options = dict(encoder=encoder, scrim=scrim, renditions=renditions, cache=cache, font_path=font_path)
+    results: list[Optional[RenderResult]] = [None] * len(jobs)
+    if workers == 1:
+        for background, items in tasks:
+            for result in _render_group(background, items, font_size, **options):
+                results[result.index] = result
+        if cache is not None:
+            cache.trim()
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_render_group, background, items, font_size, **options): items
+            for background, items in tasks
+        }
+        for future in as_completed(futures):
+            try:
+                group_results = future.result()
+            except Exception as e:
+                group_results = [
+                    RenderResult(index, output_path, f"Worker error: {e}")
+                    for index, _, _, output_path in futures[future]
+                ]
+            for result in group_results:
+                results[result.index] = result
+
+    if cache is not None:
+        cache.trim()
+    return results
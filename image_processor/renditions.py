@@ -0,0 +1,103 @@
+# image_processor/renditions.py
+"""Derive several output sizes (feed, story, thumbnail) from one composed card."""
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union
+
+from PIL import Image
+
+from .encoder import EncoderSettings
+from .metrics import metrics
+
+FIT_CONTAIN = "contain"  # Seluruh kartu terlihat, sisa area diisi pad_color
+FIT_COVER = "cover"      # Area target terisi penuh, kelebihan di-crop dari tengah
+
+
+@dataclass(frozen=True)
+class Rendition:
+    """One derived output: target size, how to fit the card, and its encoder"""
+    name: str
+    size: Optional[tuple[int, int]] = None   # None = ukuran master
+    fit: str = FIT_CONTAIN
+    pad_color: str = "#000000"
+    encoder: Optional[EncoderSettings] = None
+
+    def scale_for(self, master_size: tuple[int, int]) -> float:
+        """Uniform scale applied to the whole card before crop/pad"""
+        if self.size is None:
+            return 1.0
+        sx, sy = self.size[0] / master_size[0], self.size[1] / master_size[1]
+        return max(sx, sy) if self.fit == FIT_COVER else min(sx, sy)
+
+    def output_path(self, base_path: Union[str, Path], default: EncoderSettings) -> str:
+        """base_path with "_<name>" and this rendition's extension"""
+        base_path = Path(base_path)
+        settings = self.encoder or default
+        return str(base_path.with_name(f"{base_path.stem}_{self.name}{settings.extension}"))
+
+
+# Preset publikasi: post feed 4:5, story 9:16, thumbnail kecil
+PRESETS = {
+    "master": Rendition("master"),
+    "feed": Rendition("feed", (1080, 1350), FIT_CONTAIN, encoder=EncoderSettings(format="JPEG", quality=90)),
+    "story": Rendition("story", (1080, 1920), FIT_CONTAIN, encoder=EncoderSettings(format="JPEG", quality=88)),
+    "thumb": Rendition("thumb", (240, 300), FIT_COVER, encoder=EncoderSettings(format="WEBP", quality=80)),
+}
+
+
+def parse_renditions(spec: str) -> list[Rendition]:
+    """Comma-separated preset names, e.g. "feed,story,thumb" """
+    renditions = []
+    for name in (part.strip() for part in spec.split(",")):
+        if not name:
+            continue
+        if name not in PRESETS:
+            raise ValueError(f"Unknown rendition: {name} (choose from {', '.join(PRESETS)})")
+        renditions.append(PRESETS[name])
+    return renditions
+
+
+def _place(scaled: Image.Image, rendition: Rendition) -> Image.Image:
+    """Crop or pad a uniformly scaled card to the rendition's exact size"""
+    if rendition.size is None or scaled.size == rendition.size:
+        return scaled
+    width, height = rendition.size
+    if rendition.fit == FIT_COVER:
+        left = (scaled.width - width) // 2
+        top = (scaled.height - height) // 2
+        return scaled.crop((left, top, left + width, top + height))
+    canvas = Image.new(scaled.mode, rendition.size, rendition.pad_color)
+    canvas.paste(scaled, ((width - scaled.width) // 2, (height - scaled.height) // 2))
+    return canvas
+
+
+def derive_renditions(master: Image.Image, renditions: Iterable[Rendition]) -> list[tuple[Rendition, Image.Image]]:
+    """Build every rendition from master, chaining the downscales.
+
+    Renditions are processed from the largest scale down and each one is
+    resampled from the smallest already-scaled card that is still at least
+    as large, so a thumbnail is derived from the feed image rather than from
+    the full master. Results come back in the requested order.
+    """
+    renditions = list(renditions)
+    # Kartu utuh yang sudah di-scale (tanpa crop/pad), sumber untuk rendition berikutnya
+    sources = [master]
+    derived: dict[int, Image.Image] = {}
+
+    order = sorted(range(len(renditions)), key=lambda i: renditions[i].scale_for(master.size), reverse=True)
+    for i in order:
+        rendition = renditions[i]
+        with metrics.stage("rendition"):
+            scale = rendition.scale_for(master.size)
+            target = (max(1, round(master.width * scale)), max(1, round(master.height * scale)))
+            scaled = next((s for s in sources if s.size == target), None)
+            if scaled is None:
+                source = min(
+                    (s for s in sources if s.width >= target[0] and s.height >= target[1]),
+                    key=lambda s: s.width * s.height,
+                    default=master,
+                )
+                scaled = source.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+                sources.append(scaled)
+            derived[i] = _place(scaled, rendition)
+    return [(rendition, derived[i]) for i, rendition in enumerate(renditions)]
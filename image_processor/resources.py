@@ -0,0 +1,94 @@
+# image_processor/resources.py
+"""Process-wide cache for fonts and the watermark."""
+from pathlib import Path
+from typing import Optional, Union
+import threading
+
+from PIL import Image, ImageFont
+
+from .metrics import metrics
+
+
+class ResourceRegistry:
+    """Load each font face once per (path, size) and each watermark once per target size.
+
+    Entries are keyed by the file's mtime and size as well, so editing a file
+    on disk invalidates its cached versions. Cached objects are treated as
+    read-only and can be shared between threads; each worker process builds
+    its own registry (forked workers inherit an already warm one).
+    """
+
+    def __init__(self):
+        self._fonts: dict[tuple, ImageFont.FreeTypeFont] = {}
+        self._watermarks: dict[tuple, Image.Image] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stamp(path: Path) -> tuple:
+        stat = path.stat()
+        return (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+    def _evict_stale(self, entries: dict, stamp: tuple):
+        for key in [k for k in entries if k[0][0] == stamp[0] and k[0] != stamp]:
+            del entries[key]
+
+    def font(self, path: Union[str, Path], size: int) -> ImageFont.FreeTypeFont:
+        """Return the FreeType face for (path, size)"""
+        stamp = self._stamp(Path(path))
+        key = (stamp, size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self.hits += 1
+                return font
+            self.misses += 1
+            self._evict_stale(self._fonts, stamp)
+            with metrics.stage("font_load"):
+                font = ImageFont.truetype(stamp[0], size)
+            self._fonts[key] = font
+            return font
+
+    def watermark(self, path: Union[str, Path], size: Optional[tuple[int, int]] = None) -> Image.Image:
+        """Return the RGBA watermark, resized to size if given"""
+        stamp = self._stamp(Path(path))
+        key = (stamp, size)
+        with self._lock:
+            image = self._watermarks.get(key)
+            if image is not None:
+                self.hits += 1
+                return image
+            self.misses += 1
+            self._evict_stale(self._watermarks, stamp)
+
+            with metrics.stage("watermark_load"):
+                original = self._watermarks.get((stamp, None))
+                if original is None:
+                    original = Image.open(stamp[0]).convert("RGBA")
+                    self._watermarks[(stamp, None)] = original
+                image = original
+                if size is not None and size != original.size:
+                    image = original.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+            self._watermarks[key] = image
+            return image
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self._watermarks.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "fonts": len(self._fonts),
+                "watermarks": len(self._watermarks),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Registry bersama untuk satu proses
+resources = ResourceRegistry()
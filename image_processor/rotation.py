@@ -0,0 +1,107 @@
+# image_processor/rotation.py
+"""Non-repeating background rotation that also skips near-duplicate shots."""
+from collections import Counter, deque
+from pathlib import Path
+from typing import Optional
+import random
+import threading
+
+from .background_index import BackgroundIndex
+
+DEFAULT_WINDOW = 8
+DEFAULT_MAX_DISTANCE = 10  # bit (dari 64) untuk dianggap foto yang hampir sama
+
+
+class BackgroundRotation:
+    """Shuffle-bag scheduler over a BackgroundIndex.
+
+    Every valid background is drawn once per bag, in random order, before
+    any repeats. In addition, a background within max_distance bits of any
+    of the last window picks is skipped while another candidate is left, so
+    a series of near-identical shots is spread out instead of shown back to
+    back. Everything works from the hashes stored in the index; scheduling
+    never decodes an image.
+    """
+
+    def __init__(
+        self,
+        index: BackgroundIndex,
+        window: int = DEFAULT_WINDOW,
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        rng: Optional[random.Random] = None,
+    ):
+        self.index = index
+        self.window = window
+        self.max_distance = max_distance
+        self.rng = rng or random.Random()
+        self._bag: list[str] = []
+        self._recent: deque = deque()        # neighbor list per pick, terbaru di kanan
+        self._blocked: Counter = Counter()   # nama -> berapa pick terakhir yang memblokir
+        self._neighbors: dict[str, list[str]] = {}
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        """Start a new bag when the index gained or lost backgrounds"""
+        if self._generation == self.index.generation:
+            return
+        self._generation = self.index.generation
+        self._neighbors.clear()
+        valid = set(self.index.valid_names())
+        self._bag = [name for name in self._bag if name in valid] or self._new_bag()
+
+    def _new_bag(self) -> list[str]:
+        # Diurutkan dulu: dengan rng ber-seed hasilnya tidak bergantung pada urutan scandir
+        bag = sorted(self.index.valid_names())
+        self.rng.shuffle(bag)
+        return bag
+
+    def _neighbors_of(self, name: str) -> list[str]:
+        neighbors = self._neighbors.get(name)
+        if neighbors is None:
+            neighbors = self._neighbors[name] = self.index.near_duplicates(name, self.max_distance)
+        return neighbors
+
+    def _draw(self) -> Optional[str]:
+        if not self._bag:
+            self._bag = self._new_bag()
+            if not self._bag:
+                return None
+
+        # Ambil dari belakang bag; lewati yang mirip dengan pick terakhir
+        chosen = len(self._bag) - 1
+        for i in range(len(self._bag) - 1, -1, -1):
+            if not self._blocked[self._bag[i]]:
+                chosen = i
+                break
+        self._bag[chosen], self._bag[-1] = self._bag[-1], self._bag[chosen]
+        name = self._bag.pop()
+
+        if self.window > 0:
+            neighbors = self._neighbors_of(name)
+            self._recent.append(neighbors)
+            self._blocked.update(neighbors)
+            while len(self._recent) > self.window:
+                self._blocked.subtract(self._recent.popleft())
+        return name
+
+    def next(self, refresh: bool = True) -> Optional[Path]:
+        """Next background path, or None when the index has no valid backgrounds.
+
+        refresh=False draws from the index as it is, without scanning the
+        directory (see BackgroundIndex.random_choice).
+        """
+        if refresh:
+            self.index.refresh_if_changed()
+        with self._lock:
+            self._sync()
+            name = self._draw()
+        return None if name is None else self.index.directory / name
+
+    def take(self, count: int) -> list[Path]:
+        """Schedule count backgrounds at once (for batch runs)"""
+        self.index.refresh_if_changed()
+        with self._lock:
+            self._sync()
+            names = [self._draw() for _ in range(count)]
+        return [self.index.directory / name for name in names if name is not None]
@@ -0,0 +1,283 @@
+# image_processor/shard.py
+"""Deterministic sharding of a job manifest across machines.
+
+Usage:
+  python -m image_processor.shard plan jobs.json -o campaign.json [--backgrounds DIR]
+  python -m image_processor campaign.json --shard-index 0 --shard-count 4   (per node)
+  python -m image_processor.shard merge campaign.json [--output-dir Quotes]
+
+Manifest = format jobs.json biasa (list object) dengan "id" per job. plan mengisi
+id dan background yang kosong sekali saja, supaya semua node melihat job yang sama.
+Setiap shard menulis <output-dir>/.shards/<manifest>-<i>-of-<n>.json berisi checksum
+output-nya; merge memeriksa semua job dan menulis requeue.json untuk yang belum jadi.
+"""
+from pathlib import Path
+from typing import Optional, Union
+import hashlib
+import json
+import os
+import sys
+
+SHARDS_DIRNAME = ".shards"
+SHARD_MANIFEST_VERSION = 1
+
+
+def load_manifest(path: Union[str, Path]) -> list[dict]:
+    """Jobs from a manifest, each with a unique string "id" (default: position in the file)"""
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError(f"{path}: expected a list of job objects")
+    jobs = []
+    seen = set()
+    for index, item in enumerate(items):
+        item = dict(item)
+        item["id"] = str(item.get("id", f"{index:05d}"))
+        if item["id"] in seen:
+            raise ValueError(f"{path}: duplicate job id {item['id']!r}")
+        seen.add(item["id"])
+        jobs.append(item)
+    return jobs
+
+
+def write_manifest(path: Union[str, Path], jobs: list[dict]):
+    tmp_path = Path(f"{path}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(jobs, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def job_digest(job: dict) -> str:
+    """Hash of everything that defines a job's output (stable across machines)"""
+    raw = json.dumps(job, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def manifest_digest(jobs: list[dict]) -> str:
+    return hashlib.sha256("\n".join(job_digest(job) for job in jobs).encode("ascii")).hexdigest()
+
+
+def _background_key(background: str) -> str:
+    # Path apa adanya (bukan resolve): node lain bisa punya checkout di folder berbeda
+    return Path(background).as_posix()
+
+
+def assign_shards(jobs: list[dict], shard_count: int) -> list[int]:
+    """Shard index for every job, depending only on the manifest content.
+
+    Jobs are grouped by background so each node decodes only a subset of
+    the backgrounds. Groups are placed largest first on the least loaded
+    shard (ties by background name, then shard index). A group bigger than
+    a fair share is split so one popular background cannot leave other
+    shards idle.
+    """
+    if shard_count < 1:
+        raise ValueError("shard_count must be >= 1")
+    groups: dict[str, list[int]] = {}
+    for position, job in enumerate(jobs):
+        groups.setdefault(_background_key(job["background"]), []).append(position)
+
+    fair_share = max(1, -(-len(jobs) // shard_count))
+    pieces = []
+    for key, positions in groups.items():
+        for start in range(0, len(positions), fair_share):
+            pieces.append((key, start, positions[start:start + fair_share]))
+    pieces.sort(key=lambda piece: (-len(piece[2]), piece[0], piece[1]))
+
+    loads = [0] * shard_count
+    shards = [0] * len(jobs)
+    for _, _, positions in pieces:
+        shard = min(range(shard_count), key=lambda i: (loads[i], i))
+        loads[shard] += len(positions)
+        for position in positions:
+            shards[position] = shard
+    return shards
+
+
+def select_shard(jobs: list[dict], shard_index: int, shard_count: int) -> list[dict]:
+    """The jobs of one shard, in manifest order"""
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard index must be in 0..{shard_count - 1}, got {shard_index}")
+    shards = assign_shards(jobs, shard_count)
+    return [job for job, shard in zip(jobs, shards) if shard == shard_index]
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def shard_manifest_path(output_dir: Union[str, Path], manifest: str, shard_index: int, shard_count: int) -> Path:
+    return Path(output_dir) / SHARDS_DIRNAME / f"{manifest[:12]}-{shard_index}-of-{shard_count}.json"
+
+
+def write_shard_manifest(
+    output_dir: Union[str, Path],
+    jobs: list[dict],
+    shard_jobs: list[dict],
+    results: list,
+    shard_index: int,
+    shard_count: int,
+) -> Path:
+    """Record every job of a finished shard with the checksums of its files.
+
+    results are the RenderResults for shard_jobs, in the same order.
+    """
+    manifest = manifest_digest(jobs)
+    records = []
+    for job, result in zip(shard_jobs, results):
+        files = []
+        for written in result.outputs:
+            if written.error is None:
+                files.append({"path": written.path, "bytes": os.path.getsize(written.path),
+                              "sha256": file_sha256(written.path)})
+        records.append({"id": job["id"], "job": job_digest(job), "files": files, "error": result.error})
+
+    path = shard_manifest_path(output_dir, manifest, shard_index, shard_count)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "version": SHARD_MANIFEST_VERSION,
+        "manifest": manifest,
+        "shard_index": shard_index,
+        "shard_count": shard_count,
+        "jobs": records,
+    }
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+    return path
+
+
+def merge(jobs: list[dict], output_dir: Union[str, Path]) -> dict:
+    """Check every manifest job against the shard manifests in output_dir.
+
+    A job is done when some shard manifest recorded the same job (same id
+    and content) without error and every recorded file still exists with
+    its recorded checksum. Shard manifests of earlier re-queue runs count
+    too, so re-running the missing jobs completes the original campaign.
+    Returns {"done": [...], "failed": {id: error}, "missing": [...]}.
+    """
+    shards_dir = Path(output_dir) / SHARDS_DIRNAME
+    records: dict[tuple[str, str], list[dict]] = {}
+    for path in sorted(shards_dir.glob("*.json")) if shards_dir.is_dir() else []:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data.get("version") != SHARD_MANIFEST_VERSION:
+            continue
+        for record in data.get("jobs", []):
+            records.setdefault((record["id"], record["job"]), []).append(record)
+
+    def verified(record: dict) -> bool:
+        if record["error"] is not None or not record["files"]:
+            return False
+        for file in record["files"]:
+            try:
+                if os.path.getsize(file["path"]) != file["bytes"] or file_sha256(file["path"]) != file["sha256"]:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    report = {"done": [], "failed": {}, "missing": []}
+    for job in jobs:
+        candidates = records.get((job["id"], job_digest(job)), [])
+        if any(verified(record) for record in candidates):
+            report["done"].append(job["id"])
+        elif any(record["error"] for record in candidates):
+            report["failed"][job["id"]] = next(record["error"] for record in candidates if record["error"])
+        else:
+            report["missing"].append(job["id"])
+    return report
+
+
+def plan(jobs: list[dict], backgrounds_dir: Union[str, Path], window: Optional[int] = None,
+         max_distance: Optional[int] = None) -> list[dict]:
+    """Fill in backgrounds for jobs without one (shuffle-bag), once for all shards"""
+    from .background_index import BackgroundIndex
+    from .rotation import BackgroundRotation
+
+    missing = [job for job in jobs if not job.get("background")]
+    if missing:
+        options = {}
+        if window is not None:
+            options["window"] = window
+        if max_distance is not None:
+            options["max_distance"] = max_distance
+        rotation = BackgroundRotation(BackgroundIndex(backgrounds_dir), **options)
+        backgrounds = rotation.take(len(missing))
+        if len(backgrounds) < len(missing):
+            raise ValueError(f"No valid backgrounds in {backgrounds_dir}")
+        for job, background in zip(missing, backgrounds):
+            # Relatif terhadap folder yang diberikan, bukan path absolut mesin ini
+            job["background"] = str(Path(backgrounds_dir) / background.name)
+    return jobs
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    from config import AppConfig, ConfigError, load_config
+    from config.settings import CONFIG_PATH
+
+    try:
+        config = load_config() if CONFIG_PATH.exists() else AppConfig()
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    parser = argparse.ArgumentParser(description="Plan and merge sharded batch renders")
+    commands = parser.add_subparsers(dest="command", required=True)
+    plan_parser = commands.add_parser("plan", help="assign ids and backgrounds to a jobs file")
+    plan_parser.add_argument("jobs")
+    plan_parser.add_argument("-o", "--output", required=True, help="manifest to write")
+    plan_parser.add_argument("--backgrounds", default=config.backgrounds_dir)
+    plan_parser.add_argument("--window", type=int, default=config.random_window)
+    plan_parser.add_argument("--max-distance", type=int, default=config.near_duplicate_distance)
+    plan_parser.add_argument("--shard-count", type=int, default=None, help="also print the per-shard split")
+    merge_parser = commands.add_parser("merge", help="validate shard outputs and re-queue missing jobs")
+    merge_parser.add_argument("manifest")
+    merge_parser.add_argument("--output-dir", default=config.output_dir)
+    merge_parser.add_argument("--requeue", default=None, help="manifest for unfinished jobs (default: requeue.json)")
+    args = parser.parse_args(argv)
+
+    if args.command == "plan":
+        try:
+            jobs = plan(load_manifest(args.jobs), args.backgrounds, args.window, args.max_distance)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        write_manifest(args.output, jobs)
+        print(f"{len(jobs)} jobs, {len({_background_key(job['background']) for job in jobs})} backgrounds"
+              f" -> {args.output} ({manifest_digest(jobs)[:12]})")
+        if args.shard_count:
+            shards = assign_shards(jobs, args.shard_count)
+            for index in range(args.shard_count):
+                selected = [job for job, shard in zip(jobs, shards) if shard == index]
+                print(f"  shard {index}: {len(selected)} jobs, "
+                      f"{len({_background_key(job['background']) for job in selected})} backgrounds")
+        return 0
+
+    jobs = load_manifest(args.manifest)
+    report = merge(jobs, args.output_dir)
+    print(f"{len(report['done'])}/{len(jobs)} jobs complete, {len(report['failed'])} failed, "
+          f"{len(report['missing'])} missing")
+    for job_id, error in report["failed"].items():
+        print(f"  [{job_id}] {error}", file=sys.stderr)
+    unfinished = set(report["missing"]) | set(report["failed"])
+    if not unfinished:
+        return 0
+    requeue_path = args.requeue or "requeue.json"
+    write_manifest(requeue_path, [job for job in jobs if job["id"] in unfinished])
+    print(f"Re-queued {len(unfinished)} jobs in {requeue_path}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+# image_processor/stream.py
+"""Streaming JSONL rendering with constant memory.
+
+Usage: python -m image_processor.stream [jobs.jsonl|-] [--results results.jsonl|-]
+                                        [--ordered] [--window N] [--workers N] ...
+
+Setiap baris input satu job: {"text": ..., "background": ..., "color": ..., "output_path": ..., "id": ...}
+Setiap baris output satu hasil, segera setelah job selesai:
+{"seq": ..., "id": ..., "output_path": ..., "outputs": [...], "error": ..., "cached": ...,
+ "render_ms": ..., "encode_ms": ..., "latency_ms": ...}
+--ordered menulis hasil sesuai urutan input. Opsi lain sama dengan python -m image_processor.
+"""
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, Optional, Union
+import json
+import os
+import sys
+import time
+
+from .encoder import EncoderSettings
+from .render_cache import RenderCache
+from .renderer import FONT_PATH, FONT_SIZE, RenderResult, _default_output_path, _render_group
+from .renditions import Rendition
+
+# Job dalam proses (termasuk hasil yang menunggu giliran di mode --ordered) per worker
+WINDOW_PER_WORKER = 4
+
+
+def read_jobs(lines: Iterable[str]) -> Iterator[tuple[int, Optional[dict], Optional[str]]]:
+    """(seq, job, error) for every non-blank line, parsed one line at a time"""
+    seq = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict) or not isinstance(item.get("text"), str):
+                raise ValueError("expected an object with a \"text\" string")
+            for key in ("background", "color", "output_path"):
+                if item.get(key) is not None and not isinstance(item[key], str):
+                    raise ValueError(f"\"{key}\" must be a string")
+        except ValueError as e:
+            yield seq, None, f"Invalid job: {e}"
+        else:
+            yield seq, item, None
+        seq += 1
+
+
+def fill_backgrounds(
+    jobs: Iterable[tuple[int, Optional[dict], Optional[str]]],
+    backgrounds_dir: Union[str, Path],
+    window: Optional[int] = None,
+    max_distance: Optional[int] = None,
+) -> Iterator[tuple[int, Optional[dict], Optional[str]]]:
+    """Give jobs without a background one from the shuffle-bag, one pick at a time"""
+    rotation = None
+    for seq, item, error in jobs:
+        if item is not None and not item.get("background"):
+            if rotation is None:
+                from .background_index import BackgroundIndex
+                from .rotation import BackgroundRotation
+
+                options = {}
+                if window is not None:
+                    options["window"] = window
+                if max_distance is not None:
+                    options["max_distance"] = max_distance
+                rotation = BackgroundRotation(BackgroundIndex(backgrounds_dir), **options)
+            picked = rotation.take(1)
+            if picked:
+                item["background"] = str(picked[0])
+            else:
+                item, error = None, f"No valid backgrounds in {backgrounds_dir}"
+        yield seq, item, error
+
+
+def _record(seq: int, item: Optional[dict], result: RenderResult, latency: float) -> dict:
+    record = {"seq": seq}
+    if item is not None and "id" in item:
+        record["id"] = item["id"]
+    record.update(
+        output_path=result.output_path,
+        outputs=[output.path for output in result.outputs if output.error is None],
+        error=result.error,
+        cached=result.cached,
+        render_ms=round(result.elapsed * 1000, 2),
+        encode_ms=round(result.encode_seconds * 1000, 2),
+        latency_ms=round(latency * 1000, 2),
+    )
+    return record
+
+
+def stream_render(
+    jobs: Iterable[tuple[int, Optional[dict], Optional[str]]],
+    output_dir: Union[str, Path] = "Quotes",
+    workers: Optional[int] = None,
+    window: Optional[int] = None,
+    ordered: bool = False,
+    font_size: int = FONT_SIZE,
+    encoder: Optional[EncoderSettings] = None,
+    scrim: bool = False,
+    renditions: Optional[list[Rendition]] = None,
+    cache: Optional[RenderCache] = None,
+    font_path: Union[str, Path] = FONT_PATH,
+) -> Iterator[dict]:
+    """Render (seq, job, error) tuples lazily, yielding one result record per job.
+
+    At most window jobs are in flight or waiting to be yielded, and the
+    next job is only pulled from the input when one of them leaves, so
+    memory does not depend on the input length and a slow consumer of the
+    records slows down reading and rendering (backpressure). Records come
+    out as jobs finish, or in input order with ordered=True; a job that is
+    slow to finish then holds back the ones after it, still within the
+    window. Each job goes through the same _render_group as render_batch;
+    a decoded background stays in the worker's background cache, so
+    consecutive jobs on one background decode it once.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    window = max(1, window or workers * WINDOW_PER_WORKER)
+    extension = encoder.extension if encoder else ".png"
+    options = dict(encoder=encoder, scrim=scrim, renditions=renditions, cache=cache, font_path=font_path)
+
+    def task(seq: int, item: dict) -> tuple[str, list]:
+        output_path = item.get("output_path") or _default_output_path(output_dir, seq, extension)
+        return item["background"], [(seq, item["text"], item.get("color", "#FFFFFF"), output_path)]
+
+    buffered: dict[int, dict] = {}  # Mode ordered: hasil yang sudah selesai tapi belum gilirannya
+    next_seq = 0
+
+    def ready(record: dict) -> list[dict]:
+        nonlocal next_seq
+        if not ordered:
+            return [record]
+        buffered[record["seq"]] = record
+        out = []
+        while next_seq in buffered:
+            out.append(buffered.pop(next_seq))
+            next_seq += 1
+        return out
+
+    try:
+        if workers == 1:
+            for seq, item, error in jobs:
+                start = time.perf_counter()
+                if error is not None:
+                    result = RenderResult(seq, None, error)
+                else:
+                    background, items = task(seq, item)
+                    # Sama seperti jalur pool: error satu job jadi record, stream tetap jalan
+                    try:
+                        result = _render_group(background, items, font_size, **options)[0]
+                    except Exception as e:
+                        result = RenderResult(seq, items[0][3], f"Render error: {e}")
+                yield from ready(_record(seq, item, result, time.perf_counter() - start))
+            return
+
+        jobs = iter(jobs)
+        exhausted = False
+        pending = {}  # future -> (seq, item, waktu submit)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                while not exhausted and len(pending) + len(buffered) < window:
+                    try:
+                        seq, item, error = next(jobs)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if error is not None:
+                        yield from ready(_record(seq, item, RenderResult(seq, None, error), 0.0))
+                        continue
+                    background, items = task(seq, item)
+                    future = pool.submit(_render_group, background, items, font_size, **options)
+                    pending[future] = (seq, item, time.perf_counter())
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    seq, item, submitted = pending.pop(future)
+                    try:
+                        result = future.result()[0]
+                    except Exception as e:
+                        result = RenderResult(seq, None, f"Worker error: {e}")
+                    yield from ready(_record(seq, item, result, time.perf_counter() - submitted))
+    finally:
+        if cache is not None:
+            cache.trim()
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    from config import AppConfig, ConfigError, load_config
+    from config.settings import CONFIG_PATH
+    from .encoder import add_encoder_arguments, encoder_from_args, set_encoder_defaults
+    from .render_cache import RENDER_CACHE_DIRNAME
+    from .renditions import PRESETS, parse_renditions
+
+    try:
+        config = load_config() if CONFIG_PATH.exists() else AppConfig()
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        return 2
+    perf = config.performance
+
+    parser = argparse.ArgumentParser(description="Render quote cards from a JSONL stream of jobs")
+    parser.add_argument("jobs", nargs="?", default="-", help="JSONL file with one job per line (- for stdin)")
+    parser.add_argument("--results", default="-", help="where to write JSONL result records (- for stdout)")
+    parser.add_argument("--ordered", action="store_true", help="write results in input order")
+    parser.add_argument("--window", type=int, default=None,
+                        help=f"jobs in flight at once (default: {WINDOW_PER_WORKER} per worker)")
+    parser.add_argument("--output-dir", default=config.output_dir)
+    parser.add_argument("--workers", type=int, default=perf.batch_workers)
+    parser.add_argument("--font-size", type=int, default=config.font_size)
+    parser.add_argument("--scrim", action="store_true", help="add a gradient behind low-contrast text")
+    parser.add_argument("--backgrounds", default=config.backgrounds_dir,
+                        help="directory for jobs without a background")
+    parser.add_argument("--renditions", type=parse_renditions, default=None,
+                        help=f"comma-separated output sizes from one composite ({', '.join(PRESETS)})")
+    parser.add_argument("--no-cache", action="store_true", help="always render, ignore the render cache")
+    parser.add_argument("--cache-dir", default=None, help=f"render cache (default: <output-dir>/{RENDER_CACHE_DIRNAME})")
+    parser.add_argument("--cache-mb", type=int, default=perf.render_cache_mb,
+                        help="render cache size limit in MB")
+    add_encoder_arguments(parser)
+    set_encoder_defaults(parser, config.encoder)
+    args = parser.parse_args(argv)
+
+    cache = None
+    if not args.no_cache:
+        cache = RenderCache(args.cache_dir or Path(args.output_dir) / RENDER_CACHE_DIRNAME,
+                            args.cache_mb * 1024 * 1024)
+
+    source = sys.stdin if args.jobs == "-" else open(args.jobs, "r", encoding="utf-8")
+    sink = sys.stdout if args.results == "-" else open(args.results, "w", encoding="utf-8")
+    jobs = fill_backgrounds(read_jobs(source), args.backgrounds, config.random_window, config.near_duplicate_distance)
+    records = stream_render(
+        jobs,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        window=args.window,
+        ordered=args.ordered,
+        font_size=args.font_size,
+        encoder=encoder_from_args(args),
+        scrim=args.scrim,
+        renditions=args.renditions,
+        cache=cache,
+        font_path=config.font_path,
+    )
+
+    start = time.perf_counter()
+    count = failed = 0
+    try:
+        for record in records:
+            # Flush per record: konsumen melihat hasil segera, dan pipe yang penuh menahan render
+            sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+            sink.flush()
+            count += 1
+            failed += record["error"] is not None
+    except BrokenPipeError:
+        # Konsumen berhenti membaca (mis. | head); jangan tulis apa-apa lagi ke pipe itu
+        records.close()
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sink.fileno())
+        return 1
+    except KeyboardInterrupt:
+        records.close()
+        return 130
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    print(f"Rendered {count - failed}/{count} cards in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+# image_processor/thumbnails.py
+"""On-disk thumbnail cache for background browsing."""
+from pathlib import Path
+from typing import Union
+import hashlib
+import os
+import threading
+
+from PIL import Image
+
+THUMBNAIL_SIZE = (120, 150)
+THUMBNAIL_DIRNAME = ".thumbnails"
+
+
+class ThumbnailCache:
+    """Generate thumbnails once and keep them as small JPEGs on disk.
+
+    Entries are keyed by source path, mtime, size and thumbnail size, so a
+    changed background simply gets a new thumbnail file. get() is safe to
+    call from worker threads.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], size: tuple[int, int] = THUMBNAIL_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path_for(self, source: Union[str, Path]) -> Path:
+        source = Path(source).resolve()
+        stat = source.stat()
+        raw = f"{source}|{stat.st_mtime_ns}|{stat.st_size}|{self.size[0]}x{self.size[1]}"
+        return self.cache_dir / (hashlib.sha1(raw.encode("utf-8")).hexdigest() + ".jpg")
+
+    def get(self, source: Union[str, Path]) -> Image.Image:
+        """Return the thumbnail for source, generating and storing it on a miss"""
+        thumb_path = self.path_for(source)
+        try:
+            with Image.open(thumb_path) as cached:
+                cached.load()
+                with self._lock:
+                    self.hits += 1
+                return cached.copy()
+        except (OSError, ValueError):
+            pass
+
+        with self._lock:
+            self.misses += 1
+
+        with Image.open(source) as image:
+            # Decode langsung di skala kecil (JPEG draft), lalu perkecil
+            image.draft("RGB", self.size)
+            thumb = image.convert("RGB")
+        thumb.thumbnail(self.size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+        tmp_path = thumb_path.with_name(f"{thumb_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            thumb.save(tmp_path, "JPEG", quality=85)
+            os.replace(tmp_path, thumb_path)
+        except OSError:
+            # Folder cache tidak bisa ditulis (share read-only, ada file dengan nama itu):
+            # thumbnail tetap dipakai, hanya tidak disimpan
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+        return thumb
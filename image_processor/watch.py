@@ -0,0 +1,467 @@
+# image_processor/watch.py
+"""Watch-folder daemon: render quote files dropped into an inbox.
+
+Usage: python -m image_processor.watch [inbox] [--output-dir Quotes] [--once]
+
+File .txt berisi teks quote; file .json berisi satu object atau list object
+{"text": ..., "background": ..., "color": ...} seperti job batch. Kartu ditulis
+ke <output-dir>/<nama file>.png, mis. quote.txt.png (atau quote.json.<n>.png untuk
+beberapa job), jadi quote.txt dan quote.json tidak saling menimpa.
+"""
+from pathlib import Path
+from typing import Optional, Union
+import ctypes
+import ctypes.util
+import gc
+import hashlib
+import json
+import os
+import select
+import signal
+import sys
+import threading
+import time
+
+from .metrics import metrics
+
+QUOTE_EXTENSIONS = (".txt", ".json")
+JOURNAL_FILENAME = ".render_journal.json"
+JOURNAL_VERSION = 1
+
+SETTLE_SECONDS = 1.0      # Tunggu sampai tidak ada event selama ini sebelum render
+MAX_SETTLE_SECONDS = 10.0  # ...tapi jangan menunda lebih lama dari ini saat event terus datang
+POLL_SECONDS = 2.0
+RESCAN_SECONDS = 300.0     # Scan pengaman dengan inotify (event bisa hilang saat queue penuh)
+FAILED_RETRY_SECONDS = 600.0  # File gagal yang dependensinya tidak berubah dicoba lagi paling cepat setelah ini
+
+
+class QuoteFileError(ValueError):
+    """A quote file that cannot be turned into render jobs"""
+
+
+def _stamp(path: Union[str, Path]) -> Optional[list[int]]:
+    """[mtime_ns, size] of a file or folder, None when it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class _Inotify:
+    """Minimal inotify(7) binding via ctypes: wakes up on changes in one directory"""
+
+    # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    MASK = 0x002 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout: float) -> bool:
+        """True if something changed within timeout (pending events are drained)"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            while os.read(self.fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Poller:
+    """Fallback waker: every interval counts as a possible change (the scan decides)"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+
+    def wait(self, timeout: float) -> bool:
+        time.sleep(min(timeout, self.interval))
+        return True
+
+    def close(self):
+        pass
+
+
+def _make_waker(directory: Path, poll_interval: float, use_inotify: bool = True):
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            return _Inotify(directory)
+        except (OSError, AttributeError):
+            pass  # Mis. batas max_user_watches tercapai atau libc tanpa inotify
+    return _Poller(poll_interval)
+
+
+def _release_memory():
+    """Hand freed memory back to the OS so RSS stays flat between bursts"""
+    gc.collect()
+    if sys.platform.startswith("linux"):
+        try:
+            ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass  # Bukan glibc (mis. musl)
+
+
+def parse_quote_file(path: Path) -> list[dict]:
+    """Render job dicts (text, optional background and color) from one quote file"""
+    try:
+        content = path.read_text(encoding="utf-8-sig")
+    except (OSError, UnicodeDecodeError) as e:
+        raise QuoteFileError(f"cannot read {path.name}: {e}")
+
+    if path.suffix.lower() == ".txt":
+        items = [{"text": content}]
+    else:
+        try:
+            data = json.loads(content)
+        except ValueError as e:
+            raise QuoteFileError(f"{path.name}: not valid JSON ({e})")
+        items = data if isinstance(data, list) else [data]
+
+    jobs = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("text"), str) or not item["text"].strip():
+            raise QuoteFileError(f"{path.name}[{i}]: each quote needs a non-empty \"text\"")
+        jobs.append({
+            "text": item["text"].strip(),
+            "background": item.get("background"),
+            "color": str(item.get("color", "#FFFFFF")),
+        })
+    if not jobs:
+        raise QuoteFileError(f"{path.name}: no quotes")
+    return jobs
+
+
+class Journal:
+    """Persistent record of processed inbox files (name -> stamp, digest, outputs).
+
+    Written atomically after every batch, so a restart only renders files
+    that changed while the daemon was down.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.entries: dict[str, dict] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == JOURNAL_VERSION:
+                self.entries = data.get("entries", {})
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        data = {"version": JOURNAL_VERSION, "entries": self.entries}
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+class InboxWatcher:
+    """Render new or modified quote files from an inbox into the output folder.
+
+    Change detection is a stat diff of the inbox against the journal;
+    inotify (or a timer when inotify is unavailable) only decides when to
+    look. A burst of events is coalesced until the inbox has been quiet for
+    settle seconds, and files modified within that window are left for the
+    next round so half-written files are never rendered. A file whose
+    content hash is unchanged (touched, copied over itself) is not
+    re-rendered unless one of its outputs went missing. A file that failed
+    (bad JSON, missing background, render error) is retried when it
+    changes, when one of its backgrounds or the backgrounds folder changes,
+    when the config is reloaded, or otherwise after FAILED_RETRY_SECONDS;
+    its error is only printed again when it changes.
+
+    Memory stays flat over long uptimes: every cache on the render path is
+    bounded, the journal holds one small entry per inbox file, and freed
+    memory is returned to the OS after each batch.
+    """
+
+    def __init__(
+        self,
+        inbox: Union[str, Path],
+        output_dir: Union[str, Path],
+        config=None,
+        journal_path: Optional[Union[str, Path]] = None,
+        settle: float = SETTLE_SECONDS,
+        poll_interval: float = POLL_SECONDS,
+        use_inotify: bool = True,
+    ):
+        from config import AppConfig
+
+        self.inbox = Path(inbox).resolve()
+        self.output_dir = Path(output_dir).resolve()
+        self.config = config or AppConfig()
+        self.journal = Journal(journal_path or self.inbox / JOURNAL_FILENAME)
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.rotation = None
+        self.settling = False  # Ada file yang belum selesai ditulis saat scan terakhir
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def configure(self, config):
+        """Apply a reloaded AppConfig (used from the next batch on)"""
+        if config.backgrounds_dir != self.config.backgrounds_dir or \
+                config.random_window != self.config.random_window or \
+                config.near_duplicate_distance != self.config.near_duplicate_distance:
+            self.rotation = None
+        if config != self.config:
+            # Config baru (folder background, font, encoder) bisa memperbaiki file yang gagal
+            for entry in self.journal.entries.values():
+                entry.pop("depends", None)
+        self.config = config
+
+    @staticmethod
+    def _needs_render(entry: dict) -> bool:
+        """A journal entry whose outputs went missing, or that failed and may succeed now"""
+        if entry["error"] is not None:
+            depends = entry.get("depends")
+            if depends is None or time.time() - entry["rendered_at"] >= FAILED_RETRY_SECONDS:
+                return True
+            return any(_stamp(path) != stamp for path, stamp in depends.items())
+        return any(not Path(path).exists() for path in entry["outputs"])
+
+    def _depends(self, backgrounds: list[Optional[str]]) -> dict[str, Optional[list[int]]]:
+        """Stamps of what a failed file depends on besides its own content"""
+        paths = [self.config.backgrounds_dir] + [background for background in backgrounds if background]
+        return {str(path): _stamp(path) for path in paths}
+
+    def scan(self) -> tuple[list[tuple[str, os.stat_result, str]], bool]:
+        """Changed files as (name, stat, digest), and whether the journal needs saving.
+
+        Sets .settling when a changed file is still inside the settle window.
+        """
+        changed = []
+        dirty = False
+        self.settling = False
+        seen = set()
+        now = time.time_ns()
+        journal = self.journal.entries
+        with os.scandir(self.inbox) as it:
+            for item in it:
+                name = item.name
+                if name.startswith(".") or not name.lower().endswith(QUOTE_EXTENSIONS) or not item.is_file():
+                    continue
+                seen.add(name)
+                stat = item.stat()
+                entry = journal.get(name)
+                stamp = [stat.st_mtime_ns, stat.st_size]
+                if entry is not None and entry["stamp"] == stamp and not self._needs_render(entry):
+                    continue
+                if now - stat.st_mtime_ns < self.settle * 1e9:
+                    self.settling = True  # Mungkin masih ditulis; ambil di putaran berikutnya
+                    continue
+                try:
+                    digest = hashlib.sha256(Path(item.path).read_bytes()).hexdigest()
+                except OSError:
+                    continue  # Dihapus di antara scandir dan read
+                if entry is not None and entry["digest"] == digest and not self._needs_render(entry):
+                    entry["stamp"] = stamp  # Hanya di-touch; isinya sama
+                    dirty = True
+                    continue
+                changed.append((name, stat, digest))
+
+        for name in [name for name in journal if name not in seen]:
+            del journal[name]  # File dihapus dari inbox; kartu yang sudah jadi dibiarkan
+            dirty = True
+        return changed, dirty
+
+    def _resolve_background(self, background: Optional[str]) -> Optional[str]:
+        if not background:
+            return None
+        path = Path(background)
+        if not path.is_absolute() and not path.exists():
+            path = Path(self.config.backgrounds_dir) / path
+        return str(path)
+
+    def _next_backgrounds(self, count: int) -> list[str]:
+        if self.rotation is None:
+            from .background_index import BackgroundIndex
+            from .rotation import BackgroundRotation
+
+            self.rotation = BackgroundRotation(
+                BackgroundIndex(self.config.backgrounds_dir),
+                window=self.config.random_window,
+                max_distance=self.config.near_duplicate_distance,
+            )
+        backgrounds = [str(path) for path in self.rotation.take(count)]
+        if len(backgrounds) < count:
+            raise QuoteFileError(f"no valid backgrounds in {self.config.backgrounds_dir}")
+        return backgrounds
+
+    def process(self) -> int:
+        """Render everything that changed; returns the number of files handled"""
+        from .render_cache import RENDER_CACHE_DIRNAME, RenderCache
+        from .renderer import RenderJob, render_batch
+
+        changed, dirty = self.scan()
+        if not changed:
+            if dirty:
+                self.journal.save()
+            return 0
+
+        config = self.config
+        encoder = config.encoder.settings_for("card.png")
+        start = time.perf_counter()
+        jobs = []
+        owners = []  # (name, journal entry, error sebelumnya, job indices)
+        for name, stat, digest in changed:
+            previous = self.journal.entries.get(name, {})
+            entry = {"stamp": [stat.st_mtime_ns, stat.st_size], "digest": digest, "outputs": [],
+                     "backgrounds": [], "error": None, "rendered_at": time.time()}
+            backgrounds = []
+            try:
+                items = parse_quote_file(self.inbox / name)
+                # File yang diubah tetap memakai background yang sama dengan render sebelumnya
+                old_backgrounds = previous.get("backgrounds", [])
+                backgrounds = [self._resolve_background(item["background"]) for item in items]
+                for i, background in enumerate(backgrounds):
+                    if background is None and i < len(old_backgrounds) and Path(old_backgrounds[i]).exists():
+                        backgrounds[i] = old_backgrounds[i]
+                missing = [i for i, background in enumerate(backgrounds) if background is None]
+                for i, background in zip(missing, self._next_backgrounds(len(missing))):
+                    backgrounds[i] = background
+            except QuoteFileError as e:
+                entry["error"] = str(e)
+                entry["depends"] = self._depends(backgrounds)
+                self.journal.entries[name] = entry
+                if entry["error"] != previous.get("error"):
+                    print(f"[watch] {e}", file=sys.stderr, flush=True)
+                continue
+
+            indices = []
+            for i, (item, background) in enumerate(zip(items, backgrounds)):
+                # Nama lengkap (dengan .txt/.json) supaya a.txt dan a.json tidak menulis file yang sama
+                suffix = f".{i + 1}" if len(items) > 1 else ""
+                output_path = self.output_dir / f"{name}{suffix}{encoder.extension}"
+                indices.append(len(jobs))
+                jobs.append(RenderJob(item["text"], background, item["color"], str(output_path)))
+            entry["backgrounds"] = backgrounds
+            owners.append((name, entry, previous.get("error"), indices))
+
+        cache = RenderCache(self.output_dir / RENDER_CACHE_DIRNAME, config.performance.render_cache_mb * 1024 * 1024)
+        results = render_batch(
+            jobs,
+            output_dir=self.output_dir,
+            workers=config.performance.batch_workers,
+            font_size=config.font_size,
+            encoder=encoder,
+            cache=cache,
+            font_path=config.font_path,
+        ) if jobs else []
+
+        failed = 0
+        for name, entry, previous_error, indices in owners:
+            errors = [results[i].error for i in indices if not results[i].ok]
+            entry["outputs"] = [results[i].output_path for i in indices if results[i].ok]
+            if errors:
+                failed += 1
+                entry["error"] = "; ".join(errors)
+                entry["depends"] = self._depends(entry["backgrounds"])
+                if entry["error"] != previous_error:
+                    print(f"[watch] {name}: {entry['error']}", file=sys.stderr, flush=True)
+            self.journal.entries[name] = entry
+        self.journal.save()
+
+        if not jobs:
+            return len(changed)  # Hanya file yang masih gagal dibaca
+        elapsed = time.perf_counter() - start
+        metrics.record("watch_batch", elapsed)
+        print(f"[watch] {len(jobs)} cards from {len(changed)} files in {elapsed:.2f}s"
+              + (f" ({failed} failed)" if failed else ""), flush=True)
+        _release_memory()
+        return len(changed)
+
+    def _coalesce(self, waker):
+        """Keep absorbing events until the inbox is quiet (bounded by MAX_SETTLE_SECONDS)"""
+        deadline = time.monotonic() + MAX_SETTLE_SECONDS
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            if not waker.wait(self.settle):
+                return
+
+    def run(self, on_config=None):
+        """Process the backlog, then watch until stop() (on_config() is polled each round)"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        waker = _make_waker(self.inbox, self.poll_interval, self.use_inotify)
+        inotify = isinstance(waker, _Inotify)
+        print(f"[watch] {self.inbox} -> {self.output_dir} ({'inotify' if inotify else 'polling'})", flush=True)
+        try:
+            while not self._stop.is_set():
+                if on_config is not None:
+                    self.configure(on_config())
+                self.process()
+                # File yang masih ditulis: cek lagi setelah settle, bukan menunggu event berikutnya
+                timeout = self.settle if self.settling else (RESCAN_SECONDS if inotify else self.poll_interval)
+                if waker.wait(timeout) and inotify:
+                    self._coalesce(waker)
+        finally:
+            waker.close()
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    from config import ConfigError, ConfigWatcher
+
+    try:
+        watcher = ConfigWatcher()
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        return 2
+    watcher.on_error = lambda e: print(f"[watch] {e}\nKeeping the previous configuration.", file=sys.stderr)
+    config = watcher.current
+
+    parser = argparse.ArgumentParser(description="Render quote files dropped into an inbox folder")
+    parser.add_argument("inbox", nargs="?", default=config.inbox_dir)
+    parser.add_argument("--output-dir", default=config.output_dir)
+    parser.add_argument("--journal", default=None, help=f"processed-file journal (default: <inbox>/{JOURNAL_FILENAME})")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                        help="seconds without changes before a burst is rendered")
+    parser.add_argument("--poll-interval", type=float, default=POLL_SECONDS,
+                        help="scan interval when inotify is not available")
+    parser.add_argument("--no-inotify", action="store_true", help="always poll")
+    parser.add_argument("--once", action="store_true", help="process the inbox once and exit")
+    args = parser.parse_args(argv)
+
+    Path(args.inbox).mkdir(parents=True, exist_ok=True)
+    daemon = InboxWatcher(args.inbox, args.output_dir, config, args.journal,
+                          settle=args.settle, poll_interval=args.poll_interval,
+                          use_inotify=not args.no_inotify)
+    if args.once:
+        daemon.process()
+        return 0
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt  # Keluar juga saat sedang menunggu di select()
+
+    signal.signal(signal.SIGTERM, terminate)
+
+    def current_config():
+        watcher.check()
+        return watcher.current
+
+    try:
+        daemon.run(on_config=current_config)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
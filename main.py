@@ -1,12 +1,32 @@
 # main.py
+import time
+_T0 = time.perf_counter()  # Titik awal pengukuran start-up
+
 from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, colorchooser
-from PIL import Image, ImageTk, ImageDraw, ImageFont
 import json
 import os
-import random
-from typing import Optional, Dict, Any
+import queue
+import sys
+import threading
+from typing import Optional, Dict, TYPE_CHECKING
+
+# PIL dan modul render di-import saat pertama dipakai (setelah window tampil)
+from image_processor.metrics import metrics
+from gui.live_preview import LivePreview
+from config import AppConfig, ConfigError, ConfigWatcher
+
+if TYPE_CHECKING:
+    from PIL import Image, ImageTk
+    from image_processor.background_index import BackgroundIndex
+    from image_processor.encoder import ImageWriter
+    from image_processor.processor import Card, ImageProcessor
+
+# Sama dengan image_processor.renderer.AUTO_COLOR (tanpa import PIL)
+AUTO_COLOR = "auto"
+POLL_READY_MS = 20  # Interval cek "resource siap" untuk on_ready (benchmark start-up)
+_IMPORT_DONE = time.perf_counter()
 
 class BackgroundError(Exception):
     """Custom exception untuk error terkait background"""
@@ -18,7 +38,7 @@ class QuoteGeneratorGUI:
         resource_dir = Path("resource")
         required_files = {
             "watermark": resource_dir / "Img-3.png",
-            "font": resource_dir / "PlusJakartaSans-SemiBold.ttf"
+            "font": self.config.font_path
         }
 
         missing_files = []
@@ -34,23 +54,116 @@ class QuoteGeneratorGUI:
             )
             raise FileNotFoundError("Required resource files are missing.")
     
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, on_ready=None):
         self.root = root
         self.root.title("Quote Generator")
         self.root.geometry("1200x800")
-
-        # Validasi resource sebelum melanjutkan
-        self._validate_resources()
+        self.on_ready = on_ready
+        self.startup_times: Dict[str, float] = {"import_ms": (_IMPORT_DONE - _T0) * 1000}
         
         # State variables
-        self.current_background: Optional[Image.Image] = None
-        self.background_preview: Optional[ImageTk.PhotoImage] = None
+        self.current_background: Optional["Image.Image"] = None  # Proxy resolusi preview
+        self.current_background_path: Optional[Path] = None
+        self.background_index: Optional["BackgroundIndex"] = None
+        self.background_rotation = None
+        self.background_preview: Optional["ImageTk.PhotoImage"] = None
         self.selected_color = tk.StringVar(value="white")
-        self.config: Dict[str, Any] = {}
-        
+        self.config = AppConfig()
+        self.config_watcher: Optional[ConfigWatcher] = None
+        self.image_writer: Optional["ImageWriter"] = None
+        self.image_processor: Optional["ImageProcessor"] = None
+        self.gallery = None
+        self.status_bar: Optional[ttk.Label] = None
+        
+        # Hanya yang murah sebelum frame pertama: config JSON dan widget
+        self._load_config()
         self._setup_styles()
         self._create_main_layout()
-        self._load_config()
+        
+        # Render preview di worker thread, hasilnya dipasang lewat after()
+        self.live_preview = LivePreview(self.root, self._show_preview,
+                                        delay_ms=self.config.performance.preview_delay_ms)
+        self.live_preview.on_error = lambda e: messagebox.showerror("Error", str(e))
+        self.save_results: "queue.Queue" = queue.Queue()
+        
+        # Validasi resource, gallery, writer dan warm-up dilakukan setelah window tampil
+        self.root.bind("<Map>", self._on_first_map, add="+")
+    
+    def _on_first_map(self, event):
+        """Record time-to-first-frame, then run the deferred start-up work"""
+        if event.widget is not self.root or "first_frame_ms" in self.startup_times:
+            return
+        self.root.update_idletasks()  # Pastikan frame pertama benar-benar tergambar
+        self.startup_times["first_frame_ms"] = (time.perf_counter() - _T0) * 1000
+        self.root.after(1, self._deferred_startup)
+    
+    def _deferred_startup(self):
+        """Start-up work that does not need to block the first paint"""
+        try:
+            self._validate_resources()
+        except FileNotFoundError:
+            self.root.destroy()
+            return
+        
+        from image_processor.cache import background_cache
+        from image_processor.compositor import line_masks
+        from image_processor.encoder import ImageWriter
+        
+        # Create output directory if it doesn't exist
+        Path(self.config.output_dir).mkdir(parents=True, exist_ok=True)
+        
+        # Batas memori cache background dan mask baris teks (MB)
+        background_cache.resize(self.config.performance.background_cache_mb * 1024 * 1024)
+        line_masks.resize(self.config.performance.line_mask_cache_mb * 1024 * 1024)
+        
+        # Encode + tulis file di background thread supaya UI tidak freeze
+        self.image_writer = ImageWriter(workers=self.config.performance.writer_workers,
+                                        on_done=self.save_results.put)
+        
+        self._init_gallery()
+        self._init_metrics()
+        self.root.after(1000, self._poll_config)
+        self.startup_times["ready_ms"] = (time.perf_counter() - _T0) * 1000
+        
+        # Font dan watermark di-load di background supaya preview pertama cepat
+        self._resources_warm = threading.Event()
+        threading.Thread(target=self._warm_resources, name="warm-resources", daemon=True).start()
+        if self.on_ready is not None:
+            self.root.after(POLL_READY_MS, self._poll_ready)
+        if self.config.performance.background_store:
+            threading.Thread(target=self._sync_background_store, name="background-store", daemon=True).start()
+    
+    def _sync_background_store(self):
+        """Ingest new or changed backgrounds into the memory-mapped pixel store"""
+        from image_processor.background_store import BackgroundStore
+        
+        try:
+            BackgroundStore(self.config.backgrounds_dir).sync()
+        except OSError:
+            pass  # Tanpa store background tetap di-decode seperti biasa
+    
+    def _warm_resources(self):
+        """Load the font face and watermark (full and preview size) off the Tk thread"""
+        try:
+            from image_processor.renderer import load_font, load_watermark
+            
+            load_font(self.config.font_size, self.config.font_path)
+            watermark = load_watermark()
+            preview_size = self.config.preview_size
+            scale = min(preview_size[0] / watermark.width, preview_size[1] / watermark.height, 1.0)
+            load_watermark(size=(round(watermark.width * scale), round(watermark.height * scale)))
+        except Exception:
+            pass  # Preview pertama akan me-load sendiri
+        self.startup_times["warm_ms"] = (time.perf_counter() - _T0) * 1000
+        # Thread ini tidak boleh menyentuh Tk; _poll_ready memanggil on_ready di Tk thread
+        self._resources_warm.set()
+    
+    def _poll_ready(self):
+        """Call on_ready on the Tk thread once the resources are warm"""
+        if self._resources_warm.is_set():
+            self.on_ready(self)
+        else:
+            self.root.after(POLL_READY_MS, self._poll_ready)
         
     def _setup_styles(self):
         """Setup ttk styles"""
@@ -78,6 +191,13 @@ class QuoteGeneratorGUI:
         
         self._create_controls(controls_frame)
         
+        # Right-most panel (Gallery thumbnail background)
+        gallery_frame = ttk.Frame(main_container, style='Controls.TFrame')
+        main_container.add(gallery_frame, weight=1)
+        
+        ttk.Label(gallery_frame, text="Backgrounds").pack(pady=(10,5))
+        self.gallery_frame = gallery_frame  # Gallery dibuat setelah frame pertama
+        
     def _create_controls(self, parent: ttk.Frame):
         """Create control widgets"""
         # Background selection
@@ -138,6 +258,7 @@ class QuoteGeneratorGUI:
         ttk.Label(parent, text="Quote Text").pack(pady=(20,5))
         self.text_inputs = tk.Text(parent, wrap=tk.WORD, height=5)  # Wrap text dan atur tinggi
         self.text_inputs.pack(fill=tk.X, padx=10, pady=5)
+        self.text_inputs.bind("<<Modified>>", self._on_text_modified)
         
         self._create_color_controls(parent)
         self._create_action_buttons(parent)
@@ -159,12 +280,30 @@ class QuoteGeneratorGUI:
             text="Choose Text Color",
             command=self._choose_color
         ).pack(pady=5)    
+        
+        # Warna otomatis dari luminance area teks, scrim kalau kontras masih kurang
+        self.auto_color = tk.BooleanVar(value=False)
+        self.use_scrim = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            parent,
+            text="Auto Contrast",
+            variable=self.auto_color,
+            command=lambda: self._schedule_live_preview(immediate=True)
+        ).pack(pady=2)
+        ttk.Checkbutton(
+            parent,
+            text="Scrim Behind Text",
+            variable=self.use_scrim,
+            command=lambda: self._schedule_live_preview(immediate=True)
+        ).pack(pady=2)
      
     def _choose_color(self):
         """Open color chooser dialog and set selected color"""
         color = tk.colorchooser.askcolor(title="Choose Text Color")
         if color[1]:  # color[1] adalah kode hex warna yang dipilih
             self.selected_color = color[1]
+            self.auto_color.set(False)
+            self._schedule_live_preview(immediate=True)
                 
         
     def _create_action_buttons(self, parent):
@@ -184,6 +323,12 @@ class QuoteGeneratorGUI:
             command=self._save_quote
         ).pack(side=tk.LEFT, padx=5)
         
+        ttk.Button(
+            btn_frame,
+            text="Save All Sizes",
+            command=self._save_renditions
+        ).pack(side=tk.LEFT, padx=5)
+        
         ttk.Button(
             btn_frame,
             text="Clear",
@@ -191,72 +336,219 @@ class QuoteGeneratorGUI:
         ).pack(side=tk.LEFT, padx=5)
 
     def _load_config(self):
-        """Load application configuration"""
-        config_path = Path("config.json")
-        
-        # Default config
-        default_config = {
-            "backgrounds_dir": str(Path("backgrounds")),
-            "output_dir": str(Path("Quotes")),
-            "font_size": 40,
-            "font_family": str(Path("resource/PlusJakartaSans-SemiBold.ttf"))
-        }
-        
-        try:
-            if config_path.exists():
-                with open(config_path, 'r') as f:
-                    self.config = json.load(f)
-            else:
-                self.config = default_config
-                # Create config file if it doesn't exist
-                with open(config_path, 'w') as f:
-                    json.dump(default_config, f, indent=4)
-                    
-            # Create output directory if it doesn't exist
-            Path(self.config["output_dir"]).mkdir(parents=True, exist_ok=True)
+        """Load application configuration (config.json dibuat dengan default kalau belum ada)"""
+        self.config_watcher = ConfigWatcher(
+            on_change=self._on_config_changed,
+            on_error=self._on_config_error,
+            create=True,
+            strict=False,
+        )
+        self.config = self.config_watcher.current
+        if self.config_watcher.error is not None:
+            messagebox.showerror("Error", f"Error loading config: {self.config_watcher.error}")
+    
+    def _poll_config(self):
+        """Pick up edits to config.json without restarting"""
+        self.config_watcher.check()
+        self.root.after(1000, self._poll_config)
+    
+    def _on_config_error(self, error: ConfigError):
+        """Invalid edit: keep running with the previous settings"""
+        messagebox.showerror("Error", f"{error}\n\nThe previous settings are still in use.")
+    
+    def _on_config_changed(self, old: AppConfig, new: AppConfig):
+        """Apply a reloaded config to the running app"""
+        from image_processor.cache import background_cache
+        from image_processor.compositor import line_masks
+        from image_processor.encoder import ImageWriter
+        
+        self.config = new
+        perf, old_perf = new.performance, old.performance
+        
+        if perf.background_cache_mb != old_perf.background_cache_mb:
+            background_cache.resize(perf.background_cache_mb * 1024 * 1024)
+        if perf.line_mask_cache_mb != old_perf.line_mask_cache_mb:
+            line_masks.resize(perf.line_mask_cache_mb * 1024 * 1024)
+        self.live_preview.delay_ms = perf.preview_delay_ms
+        
+        if perf.writer_workers != old_perf.writer_workers and self.image_writer is not None:
+            # Writer lama menyelesaikan antreannya di thread sendiri
+            old_writer = self.image_writer
+            self.image_writer = ImageWriter(workers=perf.writer_workers, on_done=self.save_results.put)
+            threading.Thread(target=old_writer.close, name="writer-close", daemon=True).start()
+        
+        if new.metrics != old.metrics:
+            self._init_metrics()
+        
+        if new.output_dir != old.output_dir:
+            Path(new.output_dir).mkdir(parents=True, exist_ok=True)
+        
+        if (new.backgrounds_dir, new.random_window, new.near_duplicate_distance) != (
+                old.backgrounds_dir, old.random_window, old.near_duplicate_distance):
+            self.background_rotation = None
+        if new.backgrounds_dir != old.backgrounds_dir:
+            from image_processor.background_index import BackgroundIndex
+            from image_processor.thumbnails import THUMBNAIL_DIRNAME
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Error loading config: {str(e)}")
-            self.config = default_config
+            self.background_index = BackgroundIndex(new.backgrounds_dir)
+            if self.gallery is not None:
+                self.gallery.set_directory(self.background_index, Path(new.backgrounds_dir) / THUMBNAIL_DIRNAME)
+        
+        # Ukuran/font preview berubah: decode ulang proxy dan render ulang
+        if self.image_processor is not None:
+            self.image_processor.configure(font_size=new.font_size, font_path=new.font_path,
+                                           preview_size=new.preview_size)
+        if self.current_background_path is not None and (
+                new.preview_size != old.preview_size or new.font_size != old.font_size
+                or new.font_family != old.font_family):
+            self.current_background = self._get_processor().load_background(self.current_background_path)
+            self._update_preview()
+    
+    def _init_metrics(self):
+        """Enable render instrumentation and its sinks when configured"""
+        settings = self.config.metrics
+        if not settings.enabled:
+            metrics.configure(False, [])
+            if self.status_bar is not None:
+                self.status_bar.destroy()
+                self.status_bar = None
+            return
+        
+        from image_processor.cache import background_cache
+        from image_processor.compositor import line_masks
+        from image_processor.metrics import LogSink, PrometheusFileSink
+        from image_processor.resources import resources
+        
+        sinks = []
+        if settings.log:
+            sinks.append(LogSink())
+        if settings.prometheus_file:
+            sinks.append(PrometheusFileSink(metrics, settings.prometheus_file))
+        metrics.configure(True, sinks)
+        
+        metrics.register_gauge("background_cache_hit_ratio", lambda: background_cache.stats()["hit_rate"])
+        metrics.register_gauge("background_cache_bytes", lambda: background_cache.stats()["bytes"])
+        metrics.register_gauge("resource_cache_hit_ratio", lambda: resources.stats()["hit_rate"])
+        metrics.register_gauge("line_mask_cache_hit_ratio", lambda: line_masks.stats()["hit_rate"])
+        metrics.register_gauge("line_mask_cache_bytes", lambda: line_masks.stats()["bytes"])
+        metrics.register_gauge("save_queue_depth", lambda: self.image_writer.pending())
+        
+        if settings.status_bar and self.status_bar is None:
+            self.status_var = tk.StringVar(value="Metrics enabled")
+            self.status_bar = ttk.Label(self.root, textvariable=self.status_var, anchor='w')
+            self.status_bar.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+            self._update_status_bar()
+        elif not settings.status_bar and self.status_bar is not None:
+            self.status_bar.destroy()
+            self.status_bar = None
+    
+    def _update_status_bar(self):
+        """Show the latest stage timings and cache hit rate"""
+        if self.status_bar is None:
+            return  # Status bar dimatikan lewat config
+        snapshot = metrics.snapshot()
+        stages = snapshot["stages"]
+        parts = [
+            f"{name} {stages[name]['last_ms']:.1f} ms"
+            for name in ("decode_proxy", "decode", "watermark_paste", "layout", "text_draw", "preview_total")
+            if name in stages
+        ]
+        hit_rate = snapshot["gauges"].get("background_cache_hit_ratio")
+        if hit_rate is not None:
+            parts.append(f"cache hit {hit_rate * 100:.0f}%")
+        parts.append(f"save queue {int(snapshot['gauges'].get('save_queue_depth', 0))}")
+        self.status_var.set(" | ".join(parts))
+        self.root.after(1000, self._update_status_bar)
+    
+    def _init_gallery(self):
+        """Start filling the gallery from the backgrounds index (di background thread)"""
+        from gui.gallery import ThumbnailGallery
+        from image_processor.background_index import BackgroundIndex
+        from image_processor.thumbnails import THUMBNAIL_DIRNAME
+        
+        self.gallery = ThumbnailGallery(self.gallery_frame, on_select=self._on_gallery_select)
+        self.gallery.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0,10))
+        
+        if self.background_index is None:
+            self.background_index = BackgroundIndex(self.config.backgrounds_dir)
+        cache_dir = Path(self.config.backgrounds_dir) / THUMBNAIL_DIRNAME
+        self.gallery.set_directory(self.background_index, cache_dir)
+        
+    def _on_gallery_select(self, path: Path):
+        """Load background clicked in the gallery"""
+        self.path_var.set(str(path))
+        self._load_background_from_path(str(path))
     
     def _update_preview(self):
         """Update preview image with current background and quote"""
         if not self.current_background:
             return
             
-        # Create a copy of the background for preview
-        preview = self.current_background.copy()
-        
-        # Resize to fit preview area while maintaining aspect ratio
-        preview.thumbnail((800, 600))
-        
-        # Convert to PhotoImage for display
-        self.background_preview = ImageTk.PhotoImage(preview)
-        self.preview_label.configure(image=self.background_preview)
+        # Background sudah di-decode pada resolusi preview
+        self._show_preview(self.current_background)
+        self._schedule_live_preview(immediate=True)
+    
+    def _show_preview(self, preview: "Image.Image"):
+        """Display a rendered preview, reusing the PhotoImage when the size is unchanged"""
+        from PIL import ImageTk
+        
+        photo = self.background_preview
+        if photo is not None and (photo.width(), photo.height()) == preview.size:
+            photo.paste(preview)
+        else:
+            self.background_preview = ImageTk.PhotoImage(preview)
+            self.preview_label.configure(image=self.background_preview)
+    
+    def _on_text_modified(self, event=None):
+        """Trigger a debounced live preview while typing"""
+        if not self.text_inputs.edit_modified():
+            return
+        self.text_inputs.edit_modified(False)
+        self._schedule_live_preview()
+    
+    def _get_processor(self) -> "ImageProcessor":
+        """Render core shared by preview and save (dibuat saat pertama dipakai: import PIL)"""
+        if self.image_processor is None:
+            from image_processor.processor import ImageProcessor
+            
+            self.image_processor = ImageProcessor(
+                font_size=self.config.font_size,
+                font_path=self.config.font_path,
+                preview_size=self.config.preview_size,
+            )
+        return self.image_processor
+    
+    def _sync_card(self) -> "Card":
+        """Copy the form into the render core and snapshot it (Tk thread)"""
+        processor = self._get_processor()
+        quote_text = self.text_inputs.get("1.0", tk.END).strip()
+        processor.add_text(quote_text, self._text_color(), self.use_scrim.get())
+        return processor.card()
+    
+    def _render_preview_timed(self, card: "Card") -> "Image.Image":
+        """Worker-side preview render, timed as one stage"""
+        with metrics.stage("preview_total"):
+            preview = self.image_processor.get_preview(card)
+        # Siapkan kartu resolusi penuh selagi user melihat preview; Save tinggal menulis
+        if card.text:
+            self.image_processor.prefetch(card)
+        return preview
+    
+    def _text_color(self) -> str:
+        """Color passed to the renderer: the picked color or automatic"""
+        return AUTO_COLOR if self.auto_color.get() else self.selected_color
+    
+    def _schedule_live_preview(self, immediate: bool = False):
+        """Capture current inputs and queue a render on the preview worker"""
+        if self.current_background_path is None:
+            return
+        self.live_preview.request(self._render_preview_timed, self._sync_card(), immediate=immediate)
     
     def _split_text_into_lines(self, text: str, max_chars: int = 48) -> list[str]:
         """Split text into lines with a maximum character limit per line."""
-        words = text.split()
-        lines = []
-        current_line = ""
-
-        for word in words:
-
-        # Jika menambahkan kata berikutnya melebihi batas karakter
-            if len(current_line) + len(word) + 1 > max_chars:
-                lines.append(current_line.strip())  # Simpan baris saat ini
-                current_line = word  # Mulai baris baru dengan kata saat ini
-            else:
-                if current_line:
-                    current_line += " " + word
-                else:
-                    current_line = word
-
-        # Tambahkan baris terakhir jika ada
-        if current_line:
-            lines.append(current_line.strip())
-
-        return lines
+        from image_processor.renderer import split_text_into_lines
+        
+        return split_text_into_lines(text, max_chars=max_chars)
 
 
     # def _calculate_text_position(self, image_width: int, image_height: int, num_lines: int, font_size: int):
@@ -300,117 +592,140 @@ class QuoteGeneratorGUI:
             messagebox.showwarning("Warning", "Watermark file not found in 'resource' folder.")
             return
         
-        # Create a copy of the background
-        preview = self.current_background.copy()
-
-        # Add Watermark ti preview
-        watermark = Image.open(watermark_path).convert("RGBA")
-        preview.paste(watermark, watermark) 
-        
         # Get quote text dari tk.Text
         quote_text = self.text_inputs.get("1.0", tk.END).strip()  # Ambil semua teks dari text widget
         
         if not quote_text:
             messagebox.showwarning("Warning", "Please enter some text for the quote")
             return
-            
-        # Create preview with quote text
-        # Note: This is a simplified version. You might want to add more text styling options
-        # from PIL import ImageDraw, ImageFont
-        
-        # Bagi teks menjadi baris-baris dengan maksimal 48 karakter per baris
-        quote_lines = self._split_text_into_lines(quote_text, max_chars=48)
-
-        # Draw text on the Image
-        draw = ImageDraw.Draw(preview)
-        # font = ImageFont.truetype(self.config["font_family"], self.config["font_size"])
-        font = ImageFont.truetype(str(Path("resource/PlusJakartaSans-SemiBold.ttf")), self.config ["font_size"])
 
-        # Posisi Statis
-        x_start = 90
-        y_start = 990
-        line_height = 51
-              
-        # Draw each line
-        y = y_start # Gunakan y_start sebagai posisi Y awal
-        for line in quote_lines:
-            draw.text((x_start, y), line, font=font, fill=self.selected_color)
-            y += line_height # Update posisi Y untuk baris berikutnya
-        
-        # Update preview
-        preview.thumbnail((800, 600))
-        self.background_preview = ImageTk.PhotoImage(preview)
-        self.preview_label.configure(image=self.background_preview)
+        # Composite watermark + teks pada resolusi proxy di worker (posisi sama dengan Save)
+        self._schedule_live_preview(immediate=True)
         
-    def _save_quote(self):
-        """Save quote image"""
+    def _compose_for_save(self) -> Optional["Image.Image"]:
+        """Validate the form and compose the card at full resolution (None if not possible)"""
         if not self.current_background:
             messagebox.showwarning("Warning", "Please select a background image first")
-            return
+            return None
             
                 # Get quote text
         quote_text = self.text_inputs.get("1.0", tk.END).strip()
         
         if not quote_text:
             messagebox.showwarning("Warning", "Please enter some text for the quote")
-            return
-            
-        # Create final image
-        final = self.current_background.copy()
-
-        # Add watermark
-        watermark_path = Path("resource/Img-3.png")
-        if watermark_path.exists():
-            watermark = Image.open(watermark_path).convert("RGBA")
-            final.paste (watermark, watermark)
-
-        # Bagi teks menjadi baris-baris dengan maksimal 48 karakter per baris
-        quote_lines = self._split_text_into_lines(quote_text, max_chars=48)
+            return None
         
-        # Add quote text
-        draw = ImageDraw.Draw(final)
-        font = ImageFont.truetype(self.config["font_family"], self.config["font_size"])
+        if self.image_writer is None:
+            messagebox.showinfo("Info", "Aplikasi masih memuat resource, coba lagi sebentar")
+            return None
         
-        # Bagi teks menjadi baris-baris dengan maksimal 48 karakter per baris
-        quote_lines = self._split_text_into_lines(quote_text, max_chars=48)
-
-        # Draw text on the Image
-        draw = ImageDraw.Draw(final)
-        # font = ImageFont.truetype(self.config["font_family"], self.config["font_size"])
-        font = ImageFont.truetype(str(Path("resource/PlusJakartaSans-SemiBold.ttf")), self.config ["font_size"])
-
-        # Posisi Statis
-        x_start = 100
-        y_start = 990
-        line_height = 51
-              
-        # Draw each line
-        y = y_start # Gunakan y_start sebagai posisi Y awal
-        for line in quote_lines:
-            draw.text((x_start, y), line, font=font, fill=self.selected_color)
-            y += line_height # Update posisi Y untuk baris berikutnya
+        # Resolusi penuh; kalau form tidak berubah sejak preview, hasil prefetch langsung dipakai
+        try:
+            return self._get_processor().get_image(self._sync_card())
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return None
+    
+    def _save_quote(self):
+        """Save quote image"""
+        final = self._compose_for_save()
+        if final is None:
+            return
         
         # Save dialog
         file_path = filedialog.asksaveasfilename(
-            initialdir=self.config["output_dir"],
+            initialdir=self.config.output_dir,
             title="Save Quote Image",
             defaultextension=".png",
-            filetypes=[("JPG files", "*.jpg"), ("All files", "*.*")]
+            filetypes=[
+                ("PNG files", "*.png"),
+                ("JPG files", "*.jpg;*.jpeg"),
+                ("WebP files", "*.webp"),
+                ("All files", "*.*")
+            ]
         )
         
         if file_path:
-            try:
-                final.save(file_path)
-                messagebox.showinfo("Success", "Quote image saved successfully!")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error saving image: {str(e)}")
+            # Format mengikuti ekstensi file (kecuali encoder.format di config); RGBA -> RGB hanya kalau perlu
+            settings = self.config.encoder.settings_for(file_path)
+            self.image_writer.submit(final, file_path, settings)
+            self.root.after(50, self._poll_save_results)
+    
+    def _save_renditions(self):
+        """Save every configured size (feed, story, thumbnail) from one composite"""
+        final = self._compose_for_save()
+        if final is None:
+            return
+        
+        from image_processor.renditions import derive_renditions, parse_renditions
+        
+        try:
+            renditions = parse_renditions(",".join(self.config.renditions))
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        # Nama dasar; tiap ukuran ditulis sebagai <nama>_<rendition>.<ext>
+        file_path = filedialog.asksaveasfilename(
+            initialdir=self.config.output_dir,
+            title="Save All Sizes",
+            defaultextension=".jpg",
+            filetypes=[
+                ("JPG files", "*.jpg;*.jpeg"),
+                ("PNG files", "*.png"),
+                ("WebP files", "*.webp"),
+                ("All files", "*.*")
+            ]
+        )
+        if not file_path:
+            return
+        
+        default = self.config.encoder.settings_for(file_path)
+        group = {"remaining": len(renditions), "errors": []}
+        for rendition, image in derive_renditions(final, renditions):
+            self.image_writer.submit(image, rendition.output_path(file_path, default),
+                                     rendition.encoder or default, tag=group)
+        self.root.after(50, self._poll_save_results)
+    
+    def _poll_save_results(self):
+        """Report finished background saves on the Tk thread"""
+        try:
+            result = self.save_results.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self._poll_save_results)
+            return
+        
+        # Save All Sizes: satu pesan setelah semua file dari grup yang sama selesai
+        group = result.tag
+        if group is not None:
+            if result.error:
+                group["errors"].append(result.error)
+            group["remaining"] -= 1
+            if group["remaining"] > 0:
+                self.root.after(50, self._poll_save_results)
+                return
+            errors = group["errors"]
+        else:
+            errors = [result.error] if result.error else []
+        
+        if errors:
+            messagebox.showerror("Error", f"Error saving image: {'; '.join(errors)}")
+        else:
+            messagebox.showinfo("Success", "Quote image saved successfully!")
                 
     def _clear_form(self):
         """Clear all form inputs"""
         self.path_var.set("")
         self.text_inputs.delete("1.0", tk.END) # Hapus semua teks dari teks widget 
         self.selected_color = "#FFFFFF"   # Reset ke warna default
+        self.auto_color.set(False)
+        self.use_scrim.set(False)
         self.current_background = None
+        self.current_background_path = None
+        if self.image_processor is not None:
+            self.image_processor.clear()
+        self.live_preview.cancel()
+        self.background_preview = None
         self.preview_label.configure(image="")
         
     def _browse_file(self):
@@ -423,7 +738,7 @@ class QuoteGeneratorGUI:
         filename = filedialog.askopenfilename(
             title="Select Background Image",
             filetypes=filetypes,
-            initialdir=self.config["backgrounds_dir"]
+            initialdir=self.config.backgrounds_dir
         )
         
         if filename:
@@ -432,7 +747,7 @@ class QuoteGeneratorGUI:
             
     def _normalize_path(self, input_path: str) -> Path:
         """Normalize input path"""
-        base_path = Path(self.config["backgrounds_dir"]).resolve()
+        base_path = Path(self.config.backgrounds_dir).resolve()
         
         # Normalize slashes
         normalized_input = input_path.replace('\\', '/')
@@ -446,6 +761,7 @@ class QuoteGeneratorGUI:
         
     def _load_background_from_path(self, path_str: str):
         """Load background from given path"""
+        file_path = None
         try:
             file_path = self._normalize_path(path_str)
             
@@ -453,37 +769,66 @@ class QuoteGeneratorGUI:
             if file_path.suffix.lower() not in ('.jpg', '.jpeg', '.png'):
                 raise BackgroundError("Format file tidak didukung. Gunakan file .jpg, .jpeg, atau .png")
                 
-            # Try to load image
-            self.current_background = Image.open(file_path)
+            # Try to load image pada resolusi preview (resolusi penuh baru di-decode saat Save)
+            self.current_background = self._get_processor().load_background(file_path)
+            self.current_background_path = file_path
             self._update_preview()
             
         except Exception as e:
+            # File rusak tidak akan dipilih lagi oleh Random; file yang hilang atau tidak
+            # bisa dibuka (hak akses) bukan berarti rusak
+            decode_failed = not isinstance(e, (BackgroundError, FileNotFoundError, PermissionError,
+                                               IsADirectoryError))
+            if self.background_index is not None and file_path is not None and decode_failed:
+                self.background_index.mark_invalid(file_path, str(e))
             messagebox.showerror("Error", str(e))
             
     def _load_random_background(self):
         """Load random background from default directory"""
-        base_path = Path(self.config["backgrounds_dir"]).resolve()
-        
-        # Get all image files
-        valid_files = []
-        for ext in ('.jpg', '.jpeg', '.png'):
-            valid_files.extend(base_path.glob(f'*{ext}'))
+        # Index dibuat sekali; selanjutnya hanya file baru/berubah yang dibaca
+        if self.background_index is None:
+            from image_processor.background_index import BackgroundIndex
             
-        if not valid_files:
+            self.background_index = BackgroundIndex(self.config.backgrounds_dir)
+        # Scan di worker: probe ribuan file (mis. network share) tidak boleh menahan Tk thread.
+        # Pilihan di bawah memakai isi index saat ini; file baru ikut setelah scan selesai.
+        index = self.background_index
+        threading.Thread(target=index.refresh_if_changed, kwargs={"wait": False},
+                         name="index-refresh", daemon=True).start()
+
+        # Shuffle-bag: tidak berulang sebelum semua terpakai, dan foto yang hampir sama tidak berdekatan
+        if self.background_rotation is None:
+            from image_processor.rotation import BackgroundRotation
+            
+            self.background_rotation = BackgroundRotation(
+                self.background_index,
+                window=self.config.random_window,
+                max_distance=self.config.near_duplicate_distance,
+            )
+        file_path = self.background_rotation.next(refresh=False)
+        if file_path is None and index.scanning:
+            messagebox.showinfo("Info", "Folder background sedang di-scan, coba lagi sebentar lagi")
+            return
+        if file_path is None:
             messagebox.showwarning(
                 "Warning",
-                f"Tidak ada file gambar di folder {self.config['backgrounds_dir']}"
+                f"Tidak ada file gambar di folder {self.config.backgrounds_dir}"
             )
             return
             
-        # Choose random file
-        file_path = random.choice(valid_files)
         self.path_var.set(str(file_path))
         self._load_background_from_path(str(file_path))
 
 def main():
+    # --startup-benchmark: cetak waktu start-up (JSON) lalu keluar
+    benchmark = "--startup-benchmark" in sys.argv[1:]
+    
+    def report(app):
+        print(json.dumps({name: round(ms, 1) for name, ms in app.startup_times.items()}))
+        app.root.destroy()
+    
     root = tk.Tk()
-    app = QuoteGeneratorGUI(root)
+    app = QuoteGeneratorGUI(root, on_ready=report if benchmark else None)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,350 @@
+# server.py
+"""Local HTTP render service.
+
+Usage: python server.py [--host 127.0.0.1] [--port 8080] [--workers N] [--queue-size N]
+
+Defaults come from config.json (performance.server_workers / server_queue_size);
+edits to the queue size, encoder and font size are applied without a restart.
+
+POST /render  {"text": ..., "background": "01.jpg", "color": "#FFFFFF", "format": "png"}
+              ("color": "auto" memilih warna otomatis, "scrim": true menambah gradient)
+              -> image bytes (image/png, image/jpeg atau image/webp)
+GET  /health  -> status worker pool (JSON)
+GET  /metrics -> counter request dan latency (JSON)
+GET  /metrics/prometheus -> counter yang sama dalam format Prometheus
+"""
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dataclasses import replace
+from typing import Optional
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from config import AppConfig, ConfigError, ConfigWatcher
+from image_processor.background_index import BackgroundIndex
+from image_processor.encoder import EncoderSettings, encode
+from image_processor.metrics import metrics, prometheus_text
+from image_processor.renderer import AUTO_COLOR, X_START, compose_quote
+from image_processor.rotation import BackgroundRotation
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_FONT_SIZE = 400  # Sama dengan batas font_size di config.json
+CONTENT_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "jpg": "image/jpeg", "webp": "image/webp"}
+
+
+class RequestError(Exception):
+    """Invalid render request (HTTP 400/404/422)"""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _is_color(value: str) -> bool:
+    from PIL import ImageColor
+
+    try:
+        ImageColor.getrgb(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _init_worker(background_cache_bytes: int, line_mask_cache_bytes: int):
+    """Worker start-up: apply the configured cache budgets"""
+    from image_processor.cache import background_cache
+    from image_processor.compositor import line_masks
+
+    background_cache.resize(background_cache_bytes)
+    line_masks.resize(line_mask_cache_bytes)
+
+
+def render_to_bytes(text: str, background: str, color: str, settings: EncoderSettings, font_size: int,
+                    scrim: bool = False, font_path: str = None) -> bytes:
+    """Worker: render one card and return the encoded bytes"""
+    from image_processor.cache import background_cache
+
+    options = {} if font_path is None else {"font_path": font_path}
+    final = compose_quote(background_cache.get(background), text, color, font_size=font_size,
+                          x_start=X_START, scrim=scrim, **options)
+    return encode(final, settings)
+
+
+class RenderService:
+    """Bounded process pool with an admission limit for backpressure"""
+
+    def __init__(self, backgrounds_dir: str, workers: int, queue_size: int, config: Optional[AppConfig] = None):
+        self.config = config or AppConfig()
+        self.backgrounds_dir = Path(backgrounds_dir).resolve()
+        self.index = BackgroundIndex(self.backgrounds_dir)
+        self.index.refresh()
+        self.rotation = BackgroundRotation(
+            self.index,
+            window=self.config.random_window,
+            max_distance=self.config.near_duplicate_distance,
+        )
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(
+                self.config.performance.background_cache_mb * 1024 * 1024,
+                self.config.performance.line_mask_cache_mb * 1024 * 1024,
+            ),
+        )
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.counters = {"requests": 0, "rendered": 0, "rejected": 0, "failed": 0}
+        self.render_seconds = 0.0
+
+    def resolve_background(self, name: Optional[str]) -> str:
+        """Map a background name to a file inside backgrounds_dir"""
+        if not name:
+            path = self.rotation.next()
+            if path is None:
+                raise RequestError(404, "no valid backgrounds available")
+            return str(path)
+        path = (self.backgrounds_dir / name).resolve()
+        if path.parent != self.backgrounds_dir or not path.is_file():
+            raise RequestError(404, f"background not found: {name}")
+        # File yang sudah diketahui rusak (mis. 0 byte) ditolak di sini, tidak ikut antre render
+        reason = self.index.invalid_reason(path)
+        if reason is not None:
+            raise RequestError(422, f"background is not a usable image: {name} ({reason})")
+        return str(path)
+
+    def submit(self, job: dict) -> Optional[bytes]:
+        """Render job; returns None when the service is saturated"""
+        text = job.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise RequestError(400, "'text' is required")
+        fmt = str(job.get("format", "png")).lower()
+        if fmt not in CONTENT_TYPES:
+            raise RequestError(400, f"unsupported format: {fmt}")
+        color = job.get("color", "#FFFFFF")
+        if not isinstance(color, str) or (color != AUTO_COLOR and not _is_color(color)):
+            raise RequestError(400, f"invalid color: {color!r}")
+        config = self.config
+        font_size = job.get("font_size", config.font_size)
+        # bool adalah subclass int; true bukan ukuran font
+        if isinstance(font_size, bool) or not isinstance(font_size, int) or not 0 < font_size <= MAX_FONT_SIZE:
+            raise RequestError(400, f"font_size must be an integer from 1 to {MAX_FONT_SIZE}")
+        scrim = job.get("scrim", False)
+        if not isinstance(scrim, bool):
+            raise RequestError(400, "scrim must be true or false")
+        background = job.get("background")
+        if background is not None and not isinstance(background, str):
+            raise RequestError(400, "background must be a string")
+        background = self.resolve_background(background)
+        # Format dari request; quality dan opsi encoder lain dari config
+        settings = replace(config.encoder, format=None).settings_for(f"card.{fmt}")
+
+        with self._lock:
+            self.counters["requests"] += 1
+            # Kapasitas dicek di bawah lock supaya bisa diubah saat config di-reload
+            if self.in_flight >= self.capacity:
+                self.counters["rejected"] += 1
+                return None
+            self.in_flight += 1
+
+        start = time.perf_counter()
+        try:
+            future = self.pool.submit(
+                render_to_bytes,
+                text,
+                background,
+                color,
+                settings,
+                font_size,
+                scrim,
+                str(config.font_path),
+            )
+            data = future.result()
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.counters["rendered"] += 1
+                self.render_seconds += elapsed
+            metrics.record("request", elapsed)
+            return data
+        except Exception:
+            with self._lock:
+                self.counters["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def apply_config(self, old: AppConfig, new: AppConfig):
+        """Hot-apply settings that do not need a new worker pool"""
+        with self._lock:
+            self.config = new
+            self.capacity = self.workers + new.performance.server_queue_size
+        if (new.random_window, new.near_duplicate_distance) != (old.random_window, old.near_duplicate_distance):
+            self.rotation = BackgroundRotation(
+                self.index, window=new.random_window, max_distance=new.near_duplicate_distance
+            )
+        restart = [
+            name for name in ("backgrounds_dir", "performance.server_workers", "performance.background_cache_mb",
+                              "performance.line_mask_cache_mb")
+            if _setting(old, name) != _setting(new, name)
+        ]
+        if restart:
+            print(f"Config reloaded; restart to apply: {', '.join(restart)}", file=sys.stderr)
+
+    def health(self) -> dict:
+        with self._lock:
+            return {
+                "status": "ok",
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.workers),
+                "backgrounds": len(self.index),
+            }
+
+    def metrics(self) -> dict:
+        with self._lock:
+            rendered = self.counters["rendered"]
+            return {
+                **self.counters,
+                "in_flight": self.in_flight,
+                "avg_render_ms": (self.render_seconds / rendered * 1000) if rendered else 0.0,
+            }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 supaya koneksi keep-alive bisa dipakai ulang
+    protocol_version = "HTTP/1.1"
+    service: RenderService = None
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: dict, headers: Optional[dict] = None):
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.service.health())
+        elif self.path == "/metrics":
+            self._send_json(200, self.service.metrics())
+        elif self.path == "/metrics/prometheus":
+            body = prometheus_text(metrics.snapshot(), prefix="quote_server").encode("utf-8")
+            self._send(200, body, "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        # Body yang tidak dibaca akan di-parse sebagai request berikutnya di koneksi keep-alive;
+        # setiap error sebelum body dibaca menutup koneksi (Connection: close)
+        if self.path != "/render":
+            self._send_json(404, {"error": "not found"}, {"Connection": "close"})
+            return
+        try:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+            except ValueError:
+                length = -1
+            if length <= 0 or length > MAX_BODY_BYTES:
+                self._send_json(400, {"error": "missing, invalid or oversized request body"}, {"Connection": "close"})
+                return
+            try:
+                job = json.loads(self.rfile.read(length))
+            except ValueError:
+                raise RequestError(400, "request body must be JSON")
+            if not isinstance(job, dict):
+                raise RequestError(400, "request body must be a JSON object")
+
+            data = self.service.submit(job)
+            if data is None:
+                self._send_json(429, {"error": "server busy"}, {"Retry-After": "1"})
+                return
+            fmt = str(job.get("format", "png")).lower()
+            self._send(200, data, CONTENT_TYPES[fmt])
+        except RequestError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"render failed: {e}"})
+
+    def log_message(self, format, *args):
+        # Log per request terlalu berisik untuk beban tinggi
+        pass
+
+
+def _setting(config: AppConfig, dotted: str):
+    value = config
+    for part in dotted.split("."):
+        value = getattr(value, part)
+    return value
+
+
+def main(argv=None):
+    try:
+        watcher = ConfigWatcher()
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        raise SystemExit(2)
+    config = watcher.current
+    perf = config.performance
+
+    parser = argparse.ArgumentParser(description="Quote card render service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=perf.server_workers or os.cpu_count() or 1)
+    parser.add_argument("--queue-size", type=int, default=perf.server_queue_size)
+    args = parser.parse_args(argv)
+
+    if perf.background_store:
+        from image_processor.background_store import BackgroundStore
+
+        counts = BackgroundStore(config.backgrounds_dir).sync(workers=args.workers)
+        print("Background store: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+    service = RenderService(config.backgrounds_dir, args.workers, args.queue_size, config)
+    RenderRequestHandler.service = service
+
+    # Argumen command line tetap menang atas config yang di-reload
+    def on_change(old: AppConfig, new: AppConfig):
+        if args.queue_size != perf.server_queue_size:
+            new = replace(new, performance=replace(new.performance, server_queue_size=args.queue_size))
+        service.apply_config(old, new)
+
+    watcher.on_change = on_change
+    watcher.on_error = lambda e: print(f"{e}\nKeeping the previous configuration.", file=sys.stderr)
+    watcher.start()
+
+    # Waktu request end-to-end + gauge pool untuk endpoint Prometheus
+    metrics.configure(True)
+    metrics.register_gauge("in_flight", lambda: service.in_flight)
+    metrics.register_gauge("queued", lambda: max(0, service.in_flight - service.workers))
+    for name in service.counters:
+        metrics.register_gauge(f"{name}_total", lambda name=name: service.counters[name])
+
+    server = ThreadingHTTPServer((args.host, args.port), RenderRequestHandler)
+    server.daemon_threads = True
+    print(f"Serving on http://{args.host}:{args.port} ({args.workers} workers, capacity {service.capacity})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()